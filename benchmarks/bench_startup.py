@@ -0,0 +1,87 @@
+# Measures the import time of the shamiko CLI by `python -X importtime`.
+#
+#   python benchmarks/bench_startup.py [--repeat N] [--max-ms MS]
+#
+# Exits with a non-zero status when a module which should be loaded lazily is
+# imported at startup, or when the median import time exceeds --max-ms.
+import argparse
+import statistics
+import subprocess
+import sys
+
+# NOTE: these modules must be imported only by commands which need them
+LAZY_MODULES = [
+    "jinja2",
+    "psutil",
+    "shamiko.app",
+    "shamiko.session",
+    "shamiko.gdb_rpc",
+    "shamiko.simple_rpc.client",
+]
+
+
+def _measure(module):
+    # NOTE: returns the cumulative time of `module` and of every import
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        cumulative[name.strip()] = int(cumulative_us)
+
+    return cumulative[module], cumulative
+
+
+def main():
+    # type: () -> int
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="shamiko.cli")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = []
+    cumulative = {}
+    for _ in range(args.repeat):
+        total_us, cumulative = _measure(args.module)
+        samples.append(total_us)
+
+    median_ms = statistics.median(samples) / 1000.0
+    print(
+        "import {}: median {:.1f} ms, min {:.1f} ms ({} runs)".format(
+            args.module, median_ms, min(samples) / 1000.0, args.repeat
+        )
+    )
+    print("slowest imports (cumulative, last run):")
+    ranking = sorted(cumulative.items(), key=lambda e: e[1], reverse=True)
+    for name, us in ranking[1 : args.top + 1]:
+        print("  {:>8.1f} ms  {}".format(us / 1000.0, name))
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in cumulative]
+    if len(eager) > 0:
+        print("FAIL: imported at startup: {}".format(", ".join(eager)))
+        failed = True
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(
+            "FAIL: {:.1f} ms exceeds {:.1f} ms".format(median_ms, args.max_ms)
+        )
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,16 @@
+import os
+import re
+
 from setuptools import find_packages, setup
 
-__version__ = "0.1.0"
+
+def _get_version():
+    path = os.path.join(os.path.dirname(__file__), "shamiko", "version.py")
+    with open(path) as f:
+        return re.search(r'__version__ = "(.+)"', f.read()).group(1)
+
+
+__version__ = _get_version()
 
 setup(
     name="shamiko",
@@ -6,14 +6,36 @@ try:
     import gdb  # NOQA
 except ImportError:
     import shutil
+    import sys
     if shutil.which("gdb") is None:
         raise RuntimeError("gdb command is required") from None
 
-    from shamiko.app import Shamiko  # NOQA
-    from shamiko.session import Session  # NOQA
+    if sys.version_info < (3, 7):
+        from shamiko.app import Shamiko  # NOQA
+        from shamiko.session import Session  # NOQA
 
 import os
 
+# NOTE: load Shamiko and Session lazily to keep `import shamiko` cheap,
+# which is imported by the CLI at startup (PEP 562)
+_LAZY_ATTRIBUTES = {
+    "Shamiko": "shamiko.app",
+    "Session": "shamiko.session",
+}
+
+
+def __getattr__(name):
+    # type: (str) -> object
+    module_name = _LAZY_ATTRIBUTES.get(name, None)
+    if module_name is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+
+    import importlib
+
+    return getattr(importlib.import_module(module_name), name)
+
 
 def _get_package_root():
     # type: () -> str
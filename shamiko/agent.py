@@ -0,0 +1,167 @@
+from __future__ import absolute_import
+
+import contextlib
+import os
+import shutil
+import stat
+import tempfile
+import typing
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import shamiko
+import shamiko.namespaces
+import shamiko.session_utils
+from shamiko.simple_rpc.serializer import SerializationPromise
+from shamiko.version import __version__
+
+if typing.TYPE_CHECKING:
+    from shamiko.gdb_rpc import GdbWrapper
+
+# NOTE: the agent lives in a directory created by mkdtemp in /tmp of the
+# process, which is owned by its user with 0700, so that only the user (and
+# root) can connect to the socket. The name is unpredictable, so that the
+# directory is found by the prefix and trusted only if it is still so.
+_DIRECTORY_PREFIX = "shamiko-agent-{}-"
+_SOCKET_NAME = "agent.sock"
+# NOTE: simple_rpc is copied under a private name, which doesn't conflict
+# with shamiko installed in the process
+_PACKAGE_NAME = "_shamiko_agent_rpc"
+_RPC_MODULES = ["__init__.py", "reader.py", "serializer.py", "server.py"]
+
+
+class Agent(SerializationPromise):
+    def get_info(self):
+        # type: () -> Dict[str, Any]
+        return self._call_rpc("get_info")
+
+    def get_stacks(self):
+        # type: () -> List[Dict[str, Any]]
+        return self._call_rpc("get_stacks")
+
+    def run(self, source, filename="<agent>"):
+        # type: (str, str) -> Dict[str, Any]
+        return self._call_rpc("run", [source, filename])
+
+    def uninstall(self):
+        # type: () -> bool
+        return self._call_rpc("uninstall")
+
+
+def _get_directories(pid):
+    # type: (int) -> List[Tuple[str, str]]
+    # NOTE: returns paths seen from here and ones seen from the process
+    target_tmp = "/tmp"
+    host_tmp = shamiko.namespaces.resolve_path(pid, target_tmp)
+    prefix = _DIRECTORY_PREFIX.format(shamiko.namespaces.get_nspids(pid)[-1])
+    credentials = shamiko.namespaces.get_credentials(pid)
+    try:
+        names = sorted(os.listdir(host_tmp))
+    except (IOError, OSError):
+        return []
+
+    result = []
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+
+        host_path = os.path.join(host_tmp, name)
+        try:
+            st = os.lstat(host_path)
+        except (IOError, OSError):
+            continue
+
+        # NOTE: anyone can create a directory with the same prefix in /tmp
+        if (
+            not stat.S_ISDIR(st.st_mode)
+            or stat.S_IMODE(st.st_mode) != 0o700
+            or credentials is None
+            or st.st_uid != credentials[0]
+        ):
+            continue
+
+        result.append((host_path, os.path.join(target_tmp, name)))
+
+    return result
+
+
+@contextlib.contextmanager
+def connect(pid, timeout=None):
+    # type: (int, Optional[float]) -> Iterator[Optional[Agent]]
+    # NOTE: yields None if the agent isn't installed
+    from shamiko.simple_rpc.client import RPCClient
+
+    client = None
+    for host_path, _ in _get_directories(pid):
+        socket_path = os.path.join(host_path, _SOCKET_NAME)
+        if not os.path.exists(socket_path):
+            continue
+
+        # NOTE: the directory remains if the process was killed with the
+        # agent, whose socket no longer accepts connections
+        try:
+            client = RPCClient(socket_path, timeout)
+        except (IOError, OSError):
+            continue
+        break
+
+    if client is None:
+        yield None
+        return
+
+    try:
+        client.register_promise_class(Agent)
+        yield client.get_promise(Agent, 1)
+    finally:
+        client.close()
+
+
+def _prepare_directory(pid):
+    # type: (int) -> Tuple[str, str]
+    target_tmp = "/tmp"
+    host_path = tempfile.mkdtemp(
+        prefix=_DIRECTORY_PREFIX.format(shamiko.namespaces.get_nspids(pid)[-1]),
+        dir=shamiko.namespaces.resolve_path(pid, target_tmp),
+    )
+    target_path = os.path.join(target_tmp, os.path.basename(host_path))
+
+    lib_path = os.path.join(host_path, "lib")
+    package_path = os.path.join(lib_path, _PACKAGE_NAME)
+    os.mkdir(lib_path, 0o700)
+    os.mkdir(package_path, 0o700)
+    rpc_dir = os.path.join(shamiko._get_package_root(), "simple_rpc")
+    for name in _RPC_MODULES:
+        shutil.copyfile(
+            os.path.join(rpc_dir, name), os.path.join(package_path, name)
+        )
+
+    # NOTE: the directory is given to the process from the inside out, so
+    # that the user of the process can't modify it while it is being filled.
+    # The process removes the directory by itself on uninstall.
+    for name in _RPC_MODULES:
+        path = os.path.join(package_path, name)
+        shamiko.namespaces.give_to_process(pid, path)
+    for path in [package_path, lib_path, host_path]:
+        shamiko.namespaces.give_to_process(pid, path)
+
+    return host_path, target_path
+
+
+def install(session, pid):
+    # type: (GdbWrapper, int) -> Optional[Dict[str, Any]]
+    with connect(pid) as agent:
+        if agent is not None:
+            return dict(agent.get_info(), already_installed=True)
+
+    host_path, target_path = _prepare_directory(pid)
+    result = shamiko.session_utils.run_template(
+        session,
+        "agent.py.template",
+        directory=target_path,
+        package=_PACKAGE_NAME,
+        version=__version__,
+    )
+    if result is None:
+        # NOTE: created by mkdtemp above, not by anyone else
+        shutil.rmtree(host_path, ignore_errors=True)
+
+    return result
@@ -0,0 +1,80 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+Traceback = Tuple[Tuple[str, int], ...]
+AllocationStat = Tuple[Traceback, int, int]
+
+FORMAT_VERSION = 1
+
+
+class AllocationSnapshot:
+    def __init__(self, data):
+        # type: (Dict[str, Any]) -> None
+        if data.get("version", None) != FORMAT_VERSION:
+            raise RuntimeError(
+                "Unsupported snapshot version: {}".format(data.get("version"))
+            )
+
+        self._data = data
+        strings = data["strings"]
+        self._stats = {}  # type: Dict[Traceback, Tuple[int, int]]
+        for size, count, frames in data["stats"]:
+            traceback = tuple((strings[f], lineno) for f, lineno in frames)
+            self._stats[traceback] = (size, count)
+
+    @classmethod
+    def load(cls, path):
+        # type: (str) -> AllocationSnapshot
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        # type: (str) -> None
+        with open(path, "w") as f:
+            json.dump(self._data, f, separators=(",", ":"))
+
+    @property
+    def timestamp(self):
+        # type: () -> float
+        return self._data["timestamp"]
+
+    @property
+    def group_by(self):
+        # type: () -> str
+        return self._data["group_by"]
+
+    @property
+    def total_size(self):
+        # type: () -> int
+        return self._data["total_size"]
+
+    @property
+    def total_count(self):
+        # type: () -> int
+        return self._data["total_count"]
+
+    def top(self, limit=None):
+        # type: (Optional[int]) -> List[AllocationStat]
+        stats = [(tb, s[0], s[1]) for tb, s in self._stats.items()]
+        stats.sort(key=lambda s: s[1], reverse=True)
+        return stats[:limit]
+
+    def compare_to(self, baseline, limit=None):
+        # type: (AllocationSnapshot, Optional[int]) -> List[AllocationStat]
+        if self.group_by != baseline.group_by:
+            raise RuntimeError(
+                "Snapshots are grouped differently: {} and {}".format(
+                    self.group_by, baseline.group_by
+                )
+            )
+
+        stats = []
+        for tb in set(self._stats.keys()) | set(baseline._stats.keys()):
+            size, count = self._stats.get(tb, (0, 0))
+            base_size, base_count = baseline._stats.get(tb, (0, 0))
+            if size == base_size and count == base_count:
+                continue
+            stats.append((tb, size - base_size, count - base_count))
+
+        stats.sort(key=lambda s: abs(s[1]), reverse=True)
+        return stats[:limit]
@@ -6,19 +6,28 @@ import tempfile
 import threading
 from typing import Any, Dict, Optional
 
+import shamiko.discovery
+import shamiko.namespaces
+import shamiko.pool
 import shamiko.session
-import shamiko.proc_utils
 
 _logger = logging.getLogger(__name__)
 
 
 class Shamiko:
-    def __init__(self):
-        # type: () -> None
+    def __init__(self, pool_size=0):
+        # type: (int) -> None
         self._root_dir = tempfile.TemporaryDirectory(prefix="shamiko_")
         self._sessions = {}  # type: Dict[int, shamiko.session.Session]
         self._lock = threading.RLock()
 
+        # NOTE: pre-started gdb processes, which make attaching faster by
+        # skipping the startup of gdb and the server
+        self._pool = None  # type: Optional[shamiko.pool.GdbPool]
+        if pool_size > 0:
+            self._pool = shamiko.pool.GdbPool(self._root_dir.name, pool_size)
+            self._pool.start()
+
     def dispose(self):
         # type: () -> None
         with self._lock:
@@ -26,6 +35,8 @@ class Shamiko:
             for pid in sessions.keys():
                 self.remove(pid)
 
+            if self._pool is not None:
+                self._pool.dispose()
             self._root_dir.cleanup()
 
     def __enter__(self):
@@ -36,26 +47,52 @@ class Shamiko:
         # type: (Any, Any, Any) -> None
         self.dispose()
 
-    def attach(self, pid, executable=None, context_directory=None):
-        # type: (int, Optional[str], Optional[str]) -> shamiko.session.Session
+    def attach(
+        self,
+        pid,  # type: int
+        executable=None,  # type: Optional[str]
+        context_directory=None,  # type: Optional[str]
+        core_file=None,  # type: Optional[str]
+    ):
+        # type: (...) -> shamiko.session.Session
+        if executable is None or context_directory is None:
+            # NOTE: read /proc once for both of them
+            info = shamiko.discovery.get_process_info(pid, with_maps=False)
+
         if executable is None:
-            executable = shamiko.proc_utils.guess_executable(pid)
+            executable = info.exe if info is not None else None
             _logger.info("Guessing executable of PID=%d: %s", pid, executable)
             if executable is None:
                 raise RuntimeError("Failed to guess executable")
+            executable = shamiko.namespaces.resolve_path(pid, executable)
 
         if context_directory is None:
-            context_directory = shamiko.proc_utils.guess_context_dir(pid)
+            context_directory = info.cwd if info is not None else None
             _logger.info("Guessing context dir of PID=%d: %s", pid, context_directory)
             if context_directory is None:
                 context_directory = os.getcwd()
+            else:
+                context_directory = shamiko.namespaces.resolve_path(
+                    pid, context_directory
+                )
 
         with self._lock:
             if pid in self._sessions:
                 return self._sessions[pid]
 
+            worker = None
+            if self._pool is not None and core_file is None:
+                worker = self._pool.acquire()
+                if worker is not None:
+                    _logger.info("Using pooled gdb for PID=%d", pid)
+
             session = shamiko.session.Session(
-                self._root_dir.name, pid, executable, context_directory
+                self._root_dir.name,
+                pid,
+                executable,
+                context_directory,
+                core_file,
+                worker,
             )
             self._sessions[pid] = session
 
@@ -0,0 +1,100 @@
+import collections
+import json
+import typing
+from typing import Any, Dict, List, Optional, Tuple
+
+# NOTE: (chain, awaiting) where chain is a tuple of (filename, line, function)
+ChainKey = Tuple[Tuple[Tuple[str, int, str], ...], Optional[str]]
+
+
+class TaskGroup:
+    def __init__(self, key):
+        # type: (ChainKey) -> None
+        self.chain, self.awaiting = key
+        self.tasks = []  # type: List[Dict[str, Any]]
+        self.states = collections.Counter()  # type: typing.Counter[str]
+
+    @property
+    def count(self):
+        # type: () -> int
+        return len(self.tasks)
+
+    @property
+    def created(self):
+        # type: () -> List[Tuple[str, int, str]]
+        # NOTE: creation sites of tasks in the group, the most common first
+        sites = collections.Counter(
+            tuple(t["created"]) for t in self.tasks if t["created"] is not None
+        )
+        return [site for site, _ in sites.most_common()]
+
+
+class TaskCensus:
+    def __init__(self, data):
+        # type: (Dict[str, Any]) -> None
+        self._data = data
+
+    @classmethod
+    def load(cls, path):
+        # type: (str) -> TaskCensus
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        # type: (str) -> None
+        with open(path, "w") as f:
+            json.dump(self._data, f)
+
+    @property
+    def timestamp(self):
+        # type: () -> float
+        return self._data["timestamp"]
+
+    @property
+    def elapsed(self):
+        # type: () -> float
+        return self._data["elapsed"]
+
+    @property
+    def has_asyncio(self):
+        # type: () -> bool
+        return self._data["asyncio"]
+
+    @property
+    def tasks(self):
+        # type: () -> List[Dict[str, Any]]
+        return self._data["tasks"]
+
+    @property
+    def states(self):
+        # type: () -> typing.Counter[str]
+        return collections.Counter(t["state"] for t in self.tasks)
+
+    @property
+    def loops(self):
+        # type: () -> int
+        return len(set(t["loop"] for t in self.tasks))
+
+    def groups(self, include_done=False, limit=None):
+        # type: (bool, Optional[int]) -> List[TaskGroup]
+        # NOTE: tasks which have the same await chain are grouped, so that
+        # coroutines piling up are shown at the top
+        groups = {}  # type: Dict[ChainKey, TaskGroup]
+        for task in self.tasks:
+            if not include_done and task["state"] != "pending":
+                continue
+
+            key = (
+                tuple(tuple(entry) for entry in task["chain"]),
+                task["awaiting"],
+            )  # type: ChainKey
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = TaskGroup(key)
+            group.tasks.append(task)
+            group.states[task["state"]] += 1
+
+        result = sorted(
+            groups.values(), key=lambda g: (-g.count, g.chain, g.awaiting or "")
+        )
+        return result[:limit]
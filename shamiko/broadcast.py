@@ -0,0 +1,171 @@
+import json
+import time
+import typing
+from typing import Any, Dict, List, Optional
+
+import shamiko.namespaces
+import shamiko.session_utils
+
+if typing.TYPE_CHECKING:
+    from shamiko.app import Shamiko
+
+
+class TargetResult:
+    def __init__(
+        self,
+        pid,  # type: int
+        num=None,  # type: Optional[int]
+        lwp=None,  # type: Optional[int]
+        name=None,  # type: Optional[str]
+        frame=None,  # type: Optional[int]
+        result=None,  # type: Optional[Dict[str, Any]]
+        error=None,  # type: Optional[str]
+    ):
+        # type: (...) -> None
+        self.pid = pid
+        self.num = num
+        self.lwp = lwp
+        self.name = name
+        self.frame = frame
+        self.result = result
+        self.error = error
+
+    @property
+    def succeeded(self):
+        # type: () -> bool
+        return self.error is None
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        return {
+            "pid": self.pid,
+            "num": self.num,
+            "lwp": self.lwp,
+            "name": self.name,
+            "frame": self.frame,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def _run_in_process(
+    smk,  # type: Shamiko
+    pid,  # type: int
+    source,  # type: str
+    filename,  # type: str
+    thread_num,  # type: Optional[int]
+    frame_index,  # type: Optional[int]
+    timeout,  # type: Optional[float]
+):
+    # type: (...) -> List[TargetResult]
+    try:
+        session = smk.attach(pid)
+    except Exception as e:
+        return [TargetResult(pid, error="Failed to attach: {}".format(e))]
+
+    if timeout is not None:
+        session.set_deadline(time.time() + timeout)
+
+    try:
+        with shamiko.namespaces.SharedDirectory(pid, "shamiko_bc_") as shared:
+            script_path = shared.stage(
+                shamiko.session_utils.get_template_script(
+                    "broadcast.py.template"
+                )
+            )
+            params = {
+                "source_path": shared.put("source.py", source.encode("utf-8")),
+                "filename": filename,
+            }
+            targets = session.session.run_file_in_threads(
+                thread_num,
+                frame_index,
+                script_path,
+                params,
+                [shared.result_host(), shared.result_target()],
+            )
+
+            results = []
+            for target in targets:
+                entry = TargetResult(
+                    pid,
+                    num=target["num"],
+                    lwp=target["ptid"][1],
+                    name=target["name"],
+                    frame=target["frame"],
+                )
+                results.append(entry)
+                if target["frame"] is None:
+                    entry.error = "Couldn't run in any frame of the thread"
+                    continue
+
+                content = shared.read_result("{}.json".format(target["num"]))
+                if content is None:
+                    entry.error = (
+                        "The injected code failed before writing its result "
+                        "(see stderr of the process)"
+                    )
+                    continue
+
+                payload = json.loads(content)
+                entry.result = payload.get("result", None)
+                entry.error = payload.get("error", None)
+    except Exception as e:
+        return [TargetResult(pid, error="Failed to inject: {}".format(e))]
+    finally:
+        smk.remove(pid)
+
+    if len(results) == 0:
+        return [TargetResult(pid, error="No python frame matched")]
+
+    return results
+
+
+def run(
+    pids,  # type: List[int]
+    source,  # type: str
+    filename="<broadcast>",  # type: str
+    thread_num=None,  # type: Optional[int]
+    frame_index=None,  # type: Optional[int]
+    max_workers=8,  # type: int
+    timeout=None,  # type: Optional[float]
+):
+    # type: (...) -> List[TargetResult]
+    from concurrent.futures import ThreadPoolExecutor
+
+    from shamiko.app import Shamiko  # NOQA
+
+    # NOTE: processes are stopped independently, so that they are injected
+    # concurrently by their own gdb process. Processes beyond the first
+    # batch are attached by gdb pre-started meanwhile.
+    pool_size = max_workers if len(pids) > max_workers else 0
+    with Shamiko(pool_size=pool_size) as smk:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _run_in_process,
+                    smk,
+                    pid,
+                    source,
+                    filename,
+                    thread_num,
+                    frame_index,
+                    timeout,
+                )
+                for pid in pids
+            ]
+            results = []  # type: List[TargetResult]
+            for future in futures:
+                results.extend(future.result())
+
+    return results
+
+
+def summarize(results):
+    # type: (List[TargetResult]) -> Dict[str, int]
+    return {
+        "processes": len(set(r.pid for r in results)),
+        "targets": len(results),
+        "succeeded": sum(1 for r in results if r.succeeded),
+        "failed": sum(1 for r in results if not r.succeeded),
+    }
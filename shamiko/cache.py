@@ -0,0 +1,31 @@
+import os
+
+from shamiko.version import __version__
+
+
+def get_cache_root():
+    # type: () -> str
+    path = os.environ.get("SHAMIKO_CACHE_DIR", None)
+    if path:
+        return path
+
+    base = os.environ.get("XDG_CACHE_HOME", None) or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "shamiko")
+
+
+def get_cache_dir(*names):
+    # type: (str) -> str
+    path = os.path.join(get_cache_root(), __version__, *names)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def write_atomic(path, content):
+    # type: (str, str) -> None
+    # NOTE: other shamiko processes may read the cache concurrently
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -1,50 +1,159 @@
 from __future__ import absolute_import
 
+import collections
 import contextlib
+import json
 import os
 import subprocess
-import tempfile
+import sys
 import threading
 import time
-from typing import Callable, Iterator, Optional
+import typing
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
 
 import click
-import jinja2
-
-import shamiko
-from shamiko import proc_utils, session_utils
-from shamiko.gdb_rpc import (
-    FrameWrapper,
-    GdbWrapper,
-    InferiorWrapper,
-    ThreadWrapper,
+
+from shamiko import (
+    agent,
+    broadcast,
+    discovery,
+    gcore,
+    memory,
+    namespaces,
+    proc_utils,
+    profile_stats,
+    session_utils,
+    stack_snapshot,
+    symbol_cache,
+    thread_cpu,
 )
-from shamiko.session import Session
+from shamiko.alloc_snapshot import AllocationSnapshot
+from shamiko.asyncio_tasks import TaskCensus
+from shamiko.governor import PauseGovernor
+from shamiko.heap import HeapCensus
+from shamiko.stack_snapshot import StackSnapshot
+from shamiko.watch import StackWatcher, WatchEvent
+
+# NOTE: the RPC stack is imported by commands only when it is needed
+# in order to keep the startup time of CLI short
+if typing.TYPE_CHECKING:
+    from shamiko.gdb_rpc import GdbWrapper, InferiorWrapper
+    from shamiko.session import Session
+
+
+class _ShamikoGroup(click.Group):
+    # NOTE: most commands are invoked as `shamiko PID COMMAND`, but some
+    # commands don't need PID (e.g. `shamiko cache list`). They are
+    # registered to `standalone` and dispatched before parsing PID.
+    def __init__(self, *args, **kwargs):
+        # type: (Any, Any) -> None
+        super(_ShamikoGroup, self).__init__(*args, **kwargs)
+        self.standalone = click.Group(name=self.name)
+
+    def main(self, args=None, prog_name=None, **kwargs):  # type: ignore
+        if args is None:
+            args = sys.argv[1:]
+        args = list(args)
+
+        if len(args) > 0 and args[0] in self.standalone.commands:
+            return self.standalone.main(
+                args, prog_name=prog_name or "shamiko", **kwargs
+            )
+
+        return super(_ShamikoGroup, self).main(
+            args, prog_name=prog_name, **kwargs
+        )
+
+    def format_commands(self, ctx, formatter):
+        # type: (click.Context, click.HelpFormatter) -> None
+        super(_ShamikoGroup, self).format_commands(ctx, formatter)
 
+        rows = []
+        for name, command in sorted(self.standalone.commands.items()):
+            rows.append((name, command.get_short_help_str()))
+        if len(rows) > 0:
+            with formatter.section("Commands without PID"):
+                formatter.write_dl(rows)
 
-@click.group()
+
+@click.group(cls=_ShamikoGroup)
 @click.argument("pid", type=int, required=True)
 @click.option("--executable", "-e", type=str, default=None)
 @click.option("--context", "-c", type=str, default=None)
+@click.option("--pid-ns-of", type=int, default=None)
+@click.option("--timeout", "-t", type=float, default=None)
+@click.option("--core", type=click.Path(exists=True), default=None)
 @click.pass_context
-def cli(ctx, pid, executable, context):
-    # type: (click.Context, int, Optional[str], Optional[str]) -> None
-    if not proc_utils.pid_exists(pid):
+def cli(
+    ctx,  # type: click.Context
+    pid,  # type: int
+    executable,  # type: Optional[str]
+    context,  # type: Optional[str]
+    pid_ns_of,  # type: Optional[int]
+    timeout,  # type: Optional[float]
+    core,  # type: Optional[str]
+):
+    # type: (...) -> None
+    if pid_ns_of is not None:
+        # NOTE: PID is given as seen from the pid namespace of `pid_ns_of`,
+        # e.g. PID in a container
+        host_pid = namespaces.find_host_pid(pid, pid_ns_of)
+        if host_pid is None:
+            raise click.ClickException(
+                "Pid={} is not found in the pid namespace of pid={}".format(
+                    pid, pid_ns_of
+                )
+            )
+        pid = host_pid
+
+    if core is not None:
+        # NOTE: the core is inspected instead of the process, which may have
+        # already exited
+        core = os.path.abspath(core)
+        metadata = gcore.load_metadata(core) or {}
+        executable = executable or metadata.get("executable", None)
+        context = context or metadata.get("context_directory", None)
+        if executable is None and not proc_utils.pid_exists(pid):
+            raise click.UsageError("--executable is required for the core")
+    elif not proc_utils.pid_exists(pid):
         click.echo("Pid={} doesn't exists.".format(pid))
 
     ctx.obj = {}
     ctx.obj["pid"] = pid
     ctx.obj["executable"] = executable
     ctx.obj["context"] = context
+    ctx.obj["timeout"] = timeout
+    ctx.obj["core"] = core
 
 
 @contextlib.contextmanager
 def _get_session(ctx):
     # type: (click.Context) -> Iterator[Session]
-    with session_utils.create_session(
-        ctx.obj["pid"], ctx.obj["executable"], ctx.obj["context"]
-    ) as session:
-        yield session
+    from shamiko.simple_rpc.client import RPCTimeoutError
+
+    try:
+        with session_utils.create_session(
+            ctx.obj["pid"],
+            ctx.obj["executable"],
+            ctx.obj["context"],
+            ctx.obj["timeout"],
+            ctx.obj["core"],
+        ) as session:
+            yield session
+    except RPCTimeoutError as e:
+        raise click.ClickException("Timed out: {}".format(e))
+
+
+def _require_process(ctx):
+    # type: (click.Context) -> None
+    # NOTE: nothing can run in a core, so that commands which inject code
+    # (or keep watching the process) need the running process
+    if ctx.obj["core"] is not None:
+        raise click.UsageError(
+            "{} is not available for a core, since it needs the running "
+            "process".format(ctx.info_name)
+        )
 
 
 @contextlib.contextmanager
@@ -55,44 +164,100 @@ def _get_inferior(ctx):
         yield inferior
 
 
-def _run(
-    ctx,  # type: click.Context
-    func,  # type: Callable[[FrameWrapper], bool]
+def _print_result_message(target):
+    # type: (Optional[List[int]]) -> None
+    if target is not None:
+        click.echo(
+            "Ran successfully [thread={}, frame={}]".format(
+                target[0], target[1]
+            )
+        )
+    else:
+        click.echo(
+            "Traversed all matched frames, but couldn't run successfully"
+        )
+        click.echo("HINT: Try without --thread or --frame option")
+
+
+def _get_frame_filter(
     thread,  # type: Optional[int]
     frame,  # type: Optional[int]
+    match,  # type: List[str]
 ):
-    # type: (...) -> bool
-    with _get_inferior(ctx) as inferior:
-        return session_utils.traverse_frame(inferior, func, thread, frame)
+    # type: (...) -> Optional[Dict[str, Any]]
+    try:
+        return session_utils.create_frame_filter(thread, frame, match)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--match")
 
 
-def _print_result_message(result):
-    # type: (bool) -> None
-    if result:
-        click.echo("Ran successfully")
-    else:
-        click.echo(
-            "Traversed all matched frames, but couldn't run successfully"
+def _format_frame(frame):
+    # type: (Dict[str, Any]) -> str
+    if frame["kind"] == "native":
+        description = "[native] {} ({})".format(
+            frame["function"] or "??", frame["library"]
         )
-        click.echo("HINT: Try without --thread or --frame option")
+        if frame["address"] is not None:
+            description += " at 0x{:x}".format(frame["address"])
+    elif frame["filename"] is not None:
+        description = "File={}:{}".format(frame["filename"], frame["line"])
+        if frame["function"] is not None:
+            description += " in {}".format(frame["function"])
+    else:
+        description = frame["description"]
+
+    return "   * Frame #{}: {}".format(frame["index"], description)
+
+
+def _get_stacks_by_agent(ctx):
+    # type: (click.Context) -> Optional[List[Dict[str, Any]]]
+    from shamiko.simple_rpc.client import RPCTimeoutError
+
+    try:
+        with agent.connect(ctx.obj["pid"], ctx.obj["timeout"]) as proxy:
+            if proxy is None:
+                return None
+            return proxy.get_stacks()
+    except RPCTimeoutError as e:
+        raise click.ClickException("Timed out: {}".format(e))
+
+
+def _inspect_by_agent(ctx):
+    # type: (click.Context) -> bool
+    stacks = _get_stacks_by_agent(ctx)
+    if stacks is None:
+        return False
+
+    click.echo("(inspected by the agent without stopping the process)")
+    for stack in stacks:
+        _print_stack(stack)
+    click.echo(_summarize_thread_states(stacks))
+    return True
 
 
 @cli.command(help="inspect the running process")
+@click.option("--native", is_flag=True, default=False)
+@click.option("--no-agent", is_flag=True, default=False)
+@click.option("--thread", type=int, default=None)
+@click.option("--match", type=str, multiple=True)
 @click.pass_context
-def inspect(ctx):
-    # type: (click.Context) -> None
+def inspect(ctx, native, no_agent, thread, match):
+    # type: (click.Context, bool, bool, Optional[int], List[str]) -> None
+    frame_filter = _get_frame_filter(thread, None, match)
+    # NOTE: the agent can't see native frames and doesn't filter frames
+    if (
+        not native
+        and not no_agent
+        and frame_filter is None
+        and ctx.obj["core"] is None
+    ):
+        if _inspect_by_agent(ctx):
+            return
+
+    with _get_session(ctx) as s:
+        stacks = s.session.capture_stacks(native, frame_filter=frame_filter)
 
-    def visit_thread(thread):
-        # type: (ThreadWrapper) -> bool
-        args = {
-            "num": thread.num,
-            "global_num": thread.global_num,
-            "ptid": thread.ptid,
-            "name": thread.name,
-            "is_running": thread.is_running,
-            "is_exited": thread.is_exited,
-            "is_stopped": thread.is_stopped,
-        }
+    for stack in stacks:
         fmt = """=== Frame [num={num}] ===
  - name: {name}
  - ptid: {ptid}
@@ -100,75 +265,1066 @@ def inspect(ctx):
  - is_running: {is_running}
  - is_exited: {is_exited}
  - is_stopped: {is_stopped}
- - available python frames"""
-        click.echo(fmt.format(**args))
-        return True
-
-    def visit_frame(frame):
-        # type: (FrameWrapper) -> bool
-        description = "(Unknown Frame)"
-
-        if frame.is_evalframe:
-            description = "(unable to read python frame information)"
-            try:
-                filename = frame.filename
-                line_num = frame.current_line_num
-                description = "File={}:{}".format(filename, line_num)
-            except Exception:
-                pass  # NOQA
-        else:
-            info = frame.is_other_python_frame
-            if info:
-                description = info
+ - state: {state_description}
+ - available {kind} frames"""
+        kind = "python and native" if native else "python"
+        click.echo(
+            fmt.format(
+                kind=kind,
+                state_description=_describe_thread_state(stack),
+                **stack
+            )
+        )
+        for frame in stack["frames"]:
+            click.echo(_format_frame(frame))
+
+    click.echo(_summarize_thread_states(stacks))
 
-        fmt = "   * Frame #{}: {}".format(frame.get_index(), description)
-        click.echo(fmt)
-        return True
 
-    with _get_inferior(ctx) as inferior:
-        session_utils.visit(
-            inferior, visit_thread, visit_frame, lambda _: False
+@cli.command(
+    name="snapshot", help="save threads to a file in order to view it later"
+)
+@click.option("--output", "-o", type=click.Path(), required=True)
+@click.option("--native", is_flag=True, default=False)
+@click.option("--locals", "local_frames", type=int, default=0)
+@click.option("--repr-max-len", type=int, default=128)
+@click.option("--thread", type=int, default=None)
+@click.option("--match", type=str, multiple=True)
+@click.pass_context
+def snapshot_command(
+    ctx,  # type: click.Context
+    output,  # type: str
+    native,  # type: bool
+    local_frames,  # type: int
+    repr_max_len,  # type: int
+    thread,  # type: Optional[int]
+    match,  # type: List[str]
+):
+    # type: (...) -> None
+    frame_filter = _get_frame_filter(thread, None, match)
+    pid = ctx.obj["pid"]
+    info = discovery.get_process_info(pid)
+    process = {"pid": pid}  # type: Dict[str, Any]
+    if info is not None:
+        process.update(
+            name=info.name,
+            exe=info.exe,
+            cmdline=info.cmdline,
+            cwd=info.cwd,
+            num_threads=info.num_threads,
+            rss=info.rss,
+            python_version=info.python_version,
         )
 
+    with _get_session(ctx) as s:
+        started_at = time.time()
+        stacks = s.session.capture_stacks(
+            native, local_frames, repr_max_len, frame_filter
+        )
+        elapsed = time.time() - started_at
+
+    # NOTE: the file is written after detaching from the process
+    options = {
+        "native": native,
+        "local_frames": local_frames,
+        "repr_max_len": repr_max_len,
+        "frame_filter": frame_filter,
+    }
+    stack_snapshot.save(output, process, stacks, options, elapsed)
+    click.echo(
+        "Saved {} threads to {} (captured in {:.3f}s)".format(
+            len(stacks), output, elapsed
+        )
+    )
+
+
+def _describe_thread_state(stack):
+    # type: (Dict[str, Any]) -> str
+    description = stack["state"]
+    if stack["holds_gil"]:
+        description += " (holding GIL)"
+    elif stack["blocked_in"] is not None and stack["state"] != "running":
+        description += " (in {})".format(stack["blocked_in"])
+
+    return description
+
+
+def _summarize_thread_states(stacks):
+    # type: (List[Dict[str, Any]]) -> str
+    counts = collections.Counter(stack["state"] for stack in stacks)
+    holders = [stack for stack in stacks if stack["holds_gil"]]
+    if len(holders) > 0:
+        holder = "num={} (lwp={})".format(
+            holders[0]["num"], holders[0]["ptid"][1]
+        )
+    else:
+        holder = "(none or unknown)"
+
+    return "=== Summary: {} threads, GIL holder: {}, {} ===".format(
+        len(stacks),
+        holder,
+        ", ".join(
+            "{}: {}".format(state, count)
+            for state, count in sorted(counts.items())
+        ),
+    )
+
+
+@cli.command(help="show GIL holder and what each thread is waiting for")
+@click.pass_context
+def contention(ctx):
+    # type: (click.Context) -> None
+    with _get_session(ctx) as s:
+        stacks = s.session.capture_stacks()
+
+    click.echo(
+        "{:>5} {:>8}  {:<28} {}".format("num", "lwp", "state", "name / frame")
+    )
+    for stack in stacks:
+        top = next(
+            (f for f in stack["frames"] if f["filename"] is not None), None
+        )
+        click.echo(
+            "{:>5} {:>8}  {:<28} {}".format(
+                stack["num"],
+                stack["ptid"][1],
+                _describe_thread_state(stack),
+                stack["name"],
+            )
+        )
+        if top is not None:
+            click.echo(_format_frame(top))
+
+    click.echo(_summarize_thread_states(stacks))
+
+
+_WATCH_EVENT_LABELS = {
+    WatchEvent.NEW: "+ new thread",
+    WatchEvent.EXITED: "- exited thread",
+    WatchEvent.MOVED: "~ moved thread",
+    WatchEvent.STUCK: "! stuck thread",
+}
+
+
+def _format_governor_status(governor, pause_ratio):
+    # type: (PauseGovernor, float) -> str
+    return (
+        "paused {:.2f}% (budget {:.2f}%, {:.1f}ms per sample), "
+        "{:.2f} samples/s, interval {:.2f}s, depth limit {}".format(
+            pause_ratio * 100.0,
+            governor.budget * 100.0,
+            governor.average_pause * 1000.0,
+            governor.rate,
+            governor.interval,
+            governor.max_depth or "none",
+        )
+    )
+
+
+@cli.command(help="periodically inspect the running process and show changes")
+@click.option("--interval", type=float, default=1.0)
+@click.option("--stuck-ticks", type=int, default=5)
+@click.option("--count", type=int, default=None)
+@click.option("--native", is_flag=True, default=False)
+@click.option("--pause-budget", type=float, default=None)
+@click.option("--max-interval", type=float, default=60.0)
+@click.option("--max-depth", type=int, default=None)
+@click.pass_context
+def watch(
+    ctx,  # type: click.Context
+    interval,  # type: float
+    stuck_ticks,  # type: int
+    count,  # type: Optional[int]
+    native,  # type: bool
+    pause_budget,  # type: Optional[float]
+    max_interval,  # type: float
+    max_depth,  # type: Optional[int]
+):
+    # type: (...) -> None
+    _require_process(ctx)
+    pid = ctx.obj["pid"]
+    timeout = ctx.obj["timeout"]
+    watcher = StackWatcher(stuck_ticks)
+
+    governor = None  # type: Optional[PauseGovernor]
+    if pause_budget is not None:
+        # NOTE: the budget is given in percent, and --interval is the
+        # shortest interval the governor chooses
+        try:
+            governor = PauseGovernor(
+                pause_budget / 100.0, interval, max_interval, max_depth
+            )
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--pause-budget")
+
+    with _get_session(ctx) as s:
+        session = s.session
+        tick = 0
+        try:
+            while count is None or tick < count:
+                # NOTE: keep the gdb process alive and only re-attach to the
+                # target, so that the target runs freely between ticks
+                if timeout is not None:
+                    # NOTE: --timeout bounds each tick of watch
+                    s.set_deadline(time.time() + timeout)
+                depth = max_depth if governor is None else governor.max_depth
+                frame_filter = (
+                    {"max_depth": depth} if depth is not None else None
+                )
+                # NOTE: attaching of the first tick is done by the session,
+                # which isn't measured
+                started_at = time.time()
+                if tick > 0:
+                    session.attach(pid)
+                stacks = session.capture_stacks(
+                    native, frame_filter=frame_filter
+                )
+                session.detach()
+                pause = time.time() - started_at
+
+                for event in watcher.update(stacks, depth):
+                    state = event.state
+                    click.echo(
+                        "[tick {}] {} [num={}, lwp={}, name={}]".format(
+                            tick,
+                            _WATCH_EVENT_LABELS[event.kind],
+                            state.num,
+                            state.lwp,
+                            state.name,
+                        )
+                    )
+                    if event.kind == WatchEvent.EXITED:
+                        continue
+                    if event.kind == WatchEvent.STUCK:
+                        click.echo(
+                            "   (same stack for {} ticks)".format(
+                                state.unchanged_ticks
+                            )
+                        )
+                    for frame in state.frames:
+                        click.echo(_format_frame(frame))
+
+                tick += 1
+                if governor is None:
+                    time.sleep(interval)
+                    continue
+
+                deepest = 0
+                for stack in stacks:
+                    if len(stack["frames"]) > 0:
+                        deepest = max(deepest, stack["frames"][-1]["index"])
+                if governor.record(pause, deepest):
+                    click.echo(
+                        "[tick {}] governor: {}".format(
+                            tick,
+                            _format_governor_status(
+                                governor, governor.expected_pause_ratio
+                            ),
+                        )
+                    )
+                governor.wait()
+        except KeyboardInterrupt:
+            pass  # NOQA
+
+    if governor is not None:
+        click.echo(
+            "=== Summary: {} samples, {} ===".format(
+                tick,
+                _format_governor_status(governor, governor.pause_ratio),
+            )
+        )
+
+
+@cli.command(
+    name="top", help="show threads consuming CPU and stacks of the hottest ones"
+)
+@click.option("--interval", type=float, default=1.0)
+@click.option("--top", "top_n", type=int, default=3)
+@click.option("--limit", type=int, default=20)
+@click.option("--native", is_flag=True, default=False)
+@click.option("--no-agent", is_flag=True, default=False)
+@click.pass_context
+def top_command(ctx, interval, top_n, limit, native, no_agent):
+    # type: (click.Context, float, int, int, bool, bool) -> None
+    _require_process(ctx)
+    pid = ctx.obj["pid"]
+
+    # NOTE: CPU usage is read from /proc without stopping the process, and
+    # the process is stopped only to capture the hottest threads
+    usages = thread_cpu.sample(pid, interval)
+    if len(usages) == 0:
+        raise click.ClickException(
+            "Failed to read threads of pid={}".format(pid)
+        )
+
+    click.echo(
+        "=== CPU usage of {} threads in {:.1f}s ===".format(
+            len(usages), interval
+        )
+    )
+    click.echo(
+        "{:>8} {:>7} {:>7} {:>7}  {}".format(
+            "lwp", "cpu%", "user%", "sys%", "name"
+        )
+    )
+    for usage in usages[:limit]:
+        click.echo(
+            "{:>8} {:>7.1f} {:>7.1f} {:>7.1f}  {}".format(
+                usage.lwp, usage.cpu, usage.user, usage.system, usage.name
+            )
+        )
+
+    cpu_by_lwp = dict((u.lwp, u.cpu) for u in usages[:top_n] if u.cpu > 0)
+    if len(cpu_by_lwp) == 0:
+        click.echo("No thread consumed CPU")
+        return
+
+    stacks = None
+    if not native and not no_agent:
+        stacks = _get_stacks_by_agent(ctx)
+    if stacks is not None:
+        # NOTE: the agent sees LWPs in the pid namespace of the process
+        lwps = dict((namespaces.get_nspids(lwp)[-1], lwp) for lwp in cpu_by_lwp)
+        stacks = [
+            dict(stack, ptid=[pid, lwps[stack["ptid"][1]], 0])
+            for stack in stacks
+            if stack["ptid"][1] in lwps
+        ]
+    else:
+        with _get_session(ctx) as s:
+            stacks = s.session.capture_stacks(
+                native, frame_filter={"lwps": list(cpu_by_lwp.keys())}
+            )
+
+    stacks.sort(key=lambda stack: -cpu_by_lwp.get(stack["ptid"][1], 0.0))
+    for stack in stacks:
+        click.echo("[{:.1f}% CPU]".format(cpu_by_lwp[stack["ptid"][1]]))
+        _print_stack(stack)
+
+
+@cli.command(
+    name="gcore", help="save a core of the process and detach immediately"
+)
+@click.option("--output", "-o", type=click.Path(), default=None)
+@click.pass_context
+def gcore_command(ctx, output):
+    # type: (click.Context, Optional[str]) -> None
+    pid = ctx.obj["pid"]
+    if output is None:
+        output = "core.{}".format(pid)
+
+    metadata = gcore.generate(pid, output)
+    freeze_time = metadata["freeze_time"]
+    click.echo(
+        "Saved core to {} ({:.1f} MB) in {:.3f}s".format(
+            metadata["core"],
+            metadata["size"] / (1024.0 * 1024.0),
+            metadata["elapsed"],
+        )
+    )
+    click.echo(
+        "The process was stopped for {}".format(
+            "{:.3f}s".format(freeze_time) if freeze_time is not None else "?"
+        )
+    )
+    click.echo(
+        "HINT: inspect it by `shamiko {} --core {} inspect`".format(
+            pid, metadata["core"]
+        )
+    )
+
 
 @cli.command(help="inject a python script file into the running process")
 @click.argument("file_path", type=click.Path(exists=True))
 @click.option("--thread", type=int, default=None)
 @click.option("--frame", type=int, default=None)
+@click.option("--match", type=str, multiple=True)
 @click.pass_context
-def run_file(ctx, file_path, thread, frame):
-    # type: (click.Context, str, Optional[int], Optional[int]) -> None
-
-    def impl(frame):
-        # type: (FrameWrapper) -> bool
-        try:
-            frame.run_file(file_path)
-        except Exception:
-            return False
-
-        return True
+def run_file(
+    ctx,  # type: click.Context
+    file_path,  # type: str
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    match,  # type: List[str]
+):
+    # type: (...) -> None
+    _require_process(ctx)
+    frame_filter = _get_frame_filter(None, None, match)
+    with namespaces.SharedDirectory(ctx.obj["pid"], "shamiko_run_") as shared:
+        script_path = shared.stage(os.path.abspath(file_path))
+        with _get_session(ctx) as s:
+            target = s.session.run_file_in(
+                thread, frame, script_path, frame_filter=frame_filter
+            )
 
-    _print_result_message(_run(ctx, impl, thread, frame))
+    _print_result_message(target)
 
 
 @cli.command(help="inject a python code into the running process")
 @click.argument("script", type=str)
 @click.option("--thread", type=int, default=None)
 @click.option("--frame", type=int, default=None)
+@click.option("--match", type=str, multiple=True)
 @click.pass_context
-def run_script(ctx, script, thread, frame):
-    # type: (click.Context, str, Optional[int], Optional[int]) -> None
+def run_script(
+    ctx,  # type: click.Context
+    script,  # type: str
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    match,  # type: List[str]
+):
+    # type: (...) -> None
+    _require_process(ctx)
+    frame_filter = _get_frame_filter(None, None, match)
+    with _get_session(ctx) as s:
+        target = s.session.run_in(
+            thread, frame, script, frame_filter=frame_filter
+        )
 
-    def impl(frame):
-        # type: (FrameWrapper) -> bool
-        try:
-            frame.run_simple_string(script)
-        except Exception:
-            return False
+    _print_result_message(target)
+
+
+@cli.command(help="take a census of objects in the running process")
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--top", type=int, default=20)
+@click.option("--retained", type=int, default=0)
+@click.option("--sample", type=int, default=1000)
+@click.option("--node-limit", type=int, default=10000)
+@click.option("--output", "-o", type=click.Path(), default=None)
+@click.option("--baseline", type=click.Path(exists=True), default=None)
+@click.pass_context
+def heap(
+    ctx,  # type: click.Context
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    top,  # type: int
+    retained,  # type: int
+    sample,  # type: int
+    node_limit,  # type: int
+    output,  # type: Optional[str]
+    baseline,  # type: Optional[str]
+):
+    # type: (...) -> None
+    _require_process(ctx)
+    with _get_session(ctx) as s:
+        result = session_utils.run_template(
+            s.session,
+            "heap_census.py.template",
+            thread,
+            frame,
+            retained_top=retained,
+            sample_limit=sample,
+            node_limit=node_limit,
+        )
+
+    if result is None:
+        _print_result_message(None)
+        return
+
+    census = HeapCensus(result)
+    if output is not None:
+        census.save(output)
+
+    click.echo(
+        "=== Heap census: {} objects, {} bytes (took {:.3f}s) ===".format(
+            census.total_objects, census.total_size, census.elapsed
+        )
+    )
+    click.echo("{:>12} {:>14}  {}".format("count", "size", "type"))
+    for name, count, size in census.top_types(top):
+        click.echo("{:>12} {:>14}  {}".format(count, size, name))
 
-        return True
+    if len(census.retained) > 0:
+        title = "=== Top {} objects by reachable size{} ===".format(
+            retained, " (sampled)" if census.sampled else ""
+        )
+        click.echo(title)
+        for name, obj_id, obj_repr, size, nodes, truncated in census.retained:
+            click.echo(
+                "{:>14}{} {:>8} objs  {} at 0x{:x}: {}".format(
+                    size,
+                    "+" if truncated else " ",
+                    nodes,
+                    name,
+                    obj_id,
+                    obj_repr,
+                )
+            )
+
+    if baseline is not None:
+        base = HeapCensus.load(baseline)
+        click.echo(
+            "=== Diff from baseline ({:+.1f}s): {:+} objects, {:+} bytes ===".format(
+                census.timestamp - base.timestamp,
+                census.total_objects - base.total_objects,
+                census.total_size - base.total_size,
+            )
+        )
+        click.echo("{:>12} {:>14}  {}".format("count", "size", "type"))
+        for name, count, size in census.diff(base, top):
+            click.echo("{:>+12} {:>+14}  {}".format(count, size, name))
+
+
+def _format_counts(counts):
+    # type: (typing.Counter[str]) -> str
+    return ", ".join(
+        "{}={}".format(name, count) for name, count in sorted(counts.items())
+    )
+
+
+@cli.command(help="show asyncio tasks grouped by their await chains")
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--top", type=int, default=20)
+@click.option("--all", "show_all", is_flag=True, default=False)
+@click.option("--names", type=int, default=3)
+@click.option("--output", "-o", type=click.Path(), default=None)
+@click.pass_context
+def tasks(
+    ctx,  # type: click.Context
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    top,  # type: int
+    show_all,  # type: bool
+    names,  # type: int
+    output,  # type: Optional[str]
+):
+    # type: (...) -> None
+    _require_process(ctx)
+    with _get_session(ctx) as s:
+        result = session_utils.run_template(
+            s.session, "asyncio_tasks.py.template", thread, frame
+        )
+
+    if result is None:
+        _print_result_message(None)
+        return
+
+    census = TaskCensus(result)
+    if output is not None:
+        census.save(output)
+
+    if not census.has_asyncio:
+        click.echo("asyncio is not imported in the process")
+        return
+
+    click.echo(
+        "=== {} tasks in {} loops ({}) (took {:.3f}s) ===".format(
+            len(census.tasks),
+            census.loops,
+            _format_counts(census.states),
+            census.elapsed,
+        )
+    )
+    for group in census.groups(show_all, top):
+        click.echo(
+            "=== {} tasks ({}) awaiting {} ===".format(
+                group.count,
+                _format_counts(group.states),
+                group.awaiting or "nothing (running or ready)",
+            )
+        )
+        for filename, line, function in group.chain:
+            click.echo("   * File={}:{} in {}".format(filename, line, function))
+
+        if names > 0:
+            shown = [t["name"] for t in group.tasks[:names]]
+            if group.count > names:
+                shown.append("...")
+            click.echo("     tasks: {}".format(", ".join(shown)))
 
-    _print_result_message(_run(ctx, impl, thread, frame))
+        for filename, line, function in group.created[:1]:
+            click.echo(
+                "     created at File={}:{} in {}".format(
+                    filename, line, function
+                )
+            )
+
+
+def _echo_thread_error(target):
+    # type: (Dict[str, Any]) -> None
+    click.echo(
+        "Thread [num={}, lwp={}, name={}]: {}".format(
+            target["num"], target["ptid"][1], target["name"], target["error"]
+        )
+    )
+
+
+@cli.command(
+    name="cprofile", help="profile threads deterministically by cProfile"
+)
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--match", type=str, multiple=True)
+@click.option("--all-threads", is_flag=True, default=False)
+@click.option("--duration", type=float, default=5.0)
+@click.option("--top", type=int, default=20)
+@click.option(
+    "--sort",
+    type=click.Choice(["cumulative", "tottime", "ncalls", "filename", "name"]),
+    default="cumulative",
+)
+@click.option("--output", "-o", type=click.Path(), default=None)
+@click.pass_context
+def cprofile_command(
+    ctx,  # type: click.Context
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    match,  # type: List[str]
+    all_threads,  # type: bool
+    duration,  # type: float
+    top,  # type: int
+    sort,  # type: str
+    output,  # type: Optional[str]
+):
+    # type: (...) -> None
+    _require_process(ctx)
+    if all_threads and thread is not None:
+        raise click.UsageError("--thread can't be used with --all-threads")
+
+    if output is None:
+        output = "cprofile.{}.prof".format(ctx.obj["pid"])
+
+    frame_filter = _get_frame_filter(thread, frame, list(match))
+    if not all_threads and thread is None and len(match) == 0:
+        # NOTE: the main thread is profiled unless threads are selected
+        frame_filter = dict(frame_filter or {}, thread_num=1)
+
+    # NOTE: the profilers stop by themselves at the deadline, and the token
+    # distinguishes them from ones started by another client
+    token = uuid.uuid4().hex
+    with _get_session(ctx) as s:
+        targets = session_utils.run_template_in_threads(
+            s.session,
+            "cprofile.py.template",
+            {"action": "start", "token": token, "duration": duration},
+            frame_filter,
+        )
+
+    lwps = []
+    for target in targets:
+        if "error" in target:
+            _echo_thread_error(target)
+        elif not target["result"]["started"]:
+            raise click.ClickException(
+                "Another cprofile is running in the process for {:.1f}s "
+                "more".format(target["result"]["remaining"])
+            )
+        else:
+            lwps.append(target["ptid"][1])
+
+    if len(lwps) == 0:
+        click.echo("No thread is profiled")
+        return
+
+    click.echo("Profiling {} threads for {}s".format(len(lwps), duration))
+    try:
+        time.sleep(duration)
+    except KeyboardInterrupt:
+        click.echo("Interrupted, collecting the profile")
+
+    # NOTE: threads are selected by LWP, since gdb may number threads
+    # differently in the new session
+    with _get_session(ctx) as s:
+        targets = session_utils.run_template_in_threads(
+            s.session,
+            "cprofile.py.template",
+            {"action": "collect", "token": token, "duration": duration},
+            {"lwps": lwps},
+        )
+
+    data = []
+    for target in targets:
+        if "error" in target:
+            _echo_thread_error(target)
+            continue
+
+        result = target["result"]
+        if result["found"] and result["stats"] is not None:
+            data.append(result["stats"])
+            click.echo(
+                "Thread [num={}, lwp={}, name={}]: profiled for {:.3f}s".format(
+                    target["num"],
+                    target["ptid"][1],
+                    target["name"],
+                    result["elapsed"],
+                )
+            )
+
+    stats = profile_stats.merge(data, sys.stdout)
+    if stats is None:
+        click.echo("No profile is collected")
+        return
+
+    stats.dump_stats(output)
+    click.echo("Saved the profile to {}".format(output))
+    click.echo("HINT: view it by `python -m pstats {}`".format(output))
+    stats.sort_stats(sort).print_stats(top)
+
+
+@cli.command(
+    name="dump-var",
+    help="dump a bytes, str, bytearray, memoryview or ndarray variable",
+)
+@click.argument("variable", type=str)
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--output", "-o", type=click.Path(), required=True)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["auto", "raw", "npy", "text"]),
+    default="auto",
+)
+@click.option("--no-proc-mem", is_flag=True, default=False)
+@click.option("--match", type=str, multiple=True)
+@click.pass_context
+def dump_var(
+    ctx,  # type: click.Context
+    variable,  # type: str
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    output,  # type: str
+    output_format,  # type: str
+    no_proc_mem,  # type: bool
+    match,  # type: List[str]
+):
+    # type: (...) -> None
+    frame_filter = _get_frame_filter(None, None, match)
+    with _get_session(ctx) as s:
+        session = s.session
+        info = session.locate_buffer(thread, frame, variable, frame_filter)
+        if info is None:
+            raise click.ClickException(
+                "Variable {} is not found in matched frames".format(variable)
+            )
+
+        started_at = time.time()
+        with open(output, "wb") as f:
+            method = memory.dump(
+                session.get_selected_inferior(),
+                ctx.obj["pid"],
+                info,
+                f,
+                None if output_format == "auto" else output_format,
+                # NOTE: /proc/PID/mem is the live memory, not the core
+                use_proc=not no_proc_mem and ctx.obj["core"] is None,
+            )
+        elapsed = time.time() - started_at
+
+    click.echo(
+        "Dumped {} ({}, {} bytes at 0x{:x}) in [thread={}, frame={}]".format(
+            variable,
+            info["type_name"],
+            info["length"],
+            info["address"],
+            info["thread"],
+            info["frame"],
+        )
+    )
+    for key in ("encoding", "format", "dtype", "shape"):
+        if key in info:
+            click.echo(" - {}: {}".format(key, info[key]))
+    click.echo(
+        "Read by {} in {:.3f}s ({:.1f} MB/s) to {}".format(
+            method,
+            elapsed,
+            info["length"] / max(elapsed, 1e-6) / (1024.0 * 1024.0),
+            output,
+        )
+    )
+
+
+def _run_tracemalloc(ctx, action, thread, frame, **kwargs):
+    # type: (click.Context, str, Optional[int], Optional[int], Any) -> Any
+    params = {"frames": 1, "group_by": "traceback", "limit": 0}
+    params.update(kwargs)
+    with _get_session(ctx) as s:
+        result = session_utils.run_template(
+            s.session,
+            "tracemalloc.py.template",
+            thread,
+            frame,
+            action=action,
+            **params
+        )
+
+    if result is None:
+        _print_result_message(None)
+    return result
+
+
+def _format_traceback(traceback):
+    # type: (Any) -> str
+    return "\n".join(
+        "    File={}:{}".format(filename, lineno)
+        for filename, lineno in traceback
+    )
+
+
+@cli.group(name="tracemalloc", help="trace memory allocations of the process")
+@click.pass_context
+def tracemalloc_group(ctx):
+    # type: (click.Context) -> None
+    _require_process(ctx)
+
+
+@tracemalloc_group.command(help="start tracing memory allocations")
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--frames", type=int, default=10)
+@click.pass_context
+def start(ctx, thread, frame, frames):
+    # type: (click.Context, Optional[int], Optional[int], int) -> None
+    result = _run_tracemalloc(ctx, "start", thread, frame, frames=frames)
+    if result is not None:
+        if result["was_tracing"]:
+            click.echo("tracemalloc is already tracing")
+        else:
+            click.echo("Started tracing with {} frames".format(frames))
+
+
+@tracemalloc_group.command(help="stop tracing memory allocations")
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.pass_context
+def stop(ctx, thread, frame):
+    # type: (click.Context, Optional[int], Optional[int]) -> None
+    result = _run_tracemalloc(ctx, "stop", thread, frame)
+    if result is not None:
+        if result["was_tracing"]:
+            click.echo("Stopped tracing")
+        else:
+            click.echo("tracemalloc was not tracing")
+
+
+@tracemalloc_group.command(help="take a snapshot of traced memory allocations")
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option(
+    "--group-by",
+    type=click.Choice(["traceback", "lineno", "filename"]),
+    default="traceback",
+)
+@click.option("--limit", type=int, default=1000)
+@click.option("--top", type=int, default=10)
+@click.option("--output", "-o", type=click.Path(), default=None)
+@click.option("--compare", type=click.Path(exists=True), default=None)
+@click.pass_context
+def snapshot(
+    ctx,  # type: click.Context
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    group_by,  # type: str
+    limit,  # type: int
+    top,  # type: int
+    output,  # type: Optional[str]
+    compare,  # type: Optional[str]
+):
+    # type: (...) -> None
+    result = _run_tracemalloc(
+        ctx, "snapshot", thread, frame, group_by=group_by, limit=limit
+    )
+    if result is None:
+        return
+
+    snap = AllocationSnapshot(result)
+    if output is not None:
+        snap.save(output)
+
+    click.echo(
+        "=== Traced allocations: {} bytes in {} blocks ===".format(
+            snap.total_size, snap.total_count
+        )
+    )
+    for i, (traceback, size, count) in enumerate(snap.top(top)):
+        click.echo("#{}: {} bytes in {} blocks".format(i + 1, size, count))
+        click.echo(_format_traceback(traceback))
+
+    if compare is not None:
+        baseline = AllocationSnapshot.load(compare)
+        click.echo(
+            "=== Diff from {} ({:+.1f}s): {:+} bytes in {:+} blocks ===".format(
+                compare,
+                snap.timestamp - baseline.timestamp,
+                snap.total_size - baseline.total_size,
+                snap.total_count - baseline.total_count,
+            )
+        )
+        for i, (traceback, size, count) in enumerate(
+            snap.compare_to(baseline, top)
+        ):
+            click.echo(
+                "#{}: {:+} bytes in {:+} blocks".format(i + 1, size, count)
+            )
+            click.echo(_format_traceback(traceback))
+
+
+def _run_loop_lag(ctx, action, thread, frame, **kwargs):
+    # type: (click.Context, str, Optional[int], Optional[int], Any) -> Any
+    params = {"interval": 0.0, "threshold": 0.0, "capacity": 0, "clear": False}
+    params.update(kwargs)
+    with _get_session(ctx) as s:
+        result = session_utils.run_template(
+            s.session,
+            "loop_lag.py.template",
+            thread,
+            frame,
+            action=action,
+            **params
+        )
+
+    if result is None:
+        _print_result_message(None)
+    return result
+
+
+def _print_loop_lag(result):
+    # type: (Dict[str, Any]) -> None
+    click.echo(
+        "=== Monitoring {} loops for {:.1f}s (interval={}s, threshold={}s) "
+        "===".format(
+            len(result["loops"]),
+            time.time() - result["started_at"],
+            result["interval"],
+            result["threshold"],
+        )
+    )
+    for loop in result["loops"]:
+        click.echo(
+            "Loop 0x{:x} [thread={}]: {} beats, average lag {:.3f}s, "
+            "max lag {:.3f}s".format(
+                loop["id"],
+                loop["thread"],
+                loop["beats"],
+                loop["total_lag"] / max(loop["beats"], 1),
+                loop["max_lag"],
+            )
+        )
+
+    if result["dropped"] > 0:
+        click.echo(
+            "({} older stalls were dropped, increase --capacity to keep "
+            "them)".format(result["dropped"])
+        )
+
+    for finding in result["findings"]:
+        if finding["duration"] is None:
+            duration = "ongoing for {:.3f}s+".format(finding["lag"])
+        else:
+            duration = "blocked for {:.3f}s".format(finding["duration"])
+        click.echo(
+            "=== {} loop 0x{:x} [thread={}] {} ===".format(
+                time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.localtime(finding["timestamp"])
+                ),
+                finding["loop"],
+                finding["thread"],
+                duration,
+            )
+        )
+        for filename, line, function in finding["stack"]:
+            click.echo("   * File={}:{} in {}".format(filename, line, function))
+
+
+@cli.group(name="loop-lag", help="detect callbacks blocking asyncio loops")
+@click.pass_context
+def loop_lag_group(ctx):
+    # type: (click.Context) -> None
+    _require_process(ctx)
+
+
+@loop_lag_group.command(
+    name="install", help="install the monitor into running asyncio loops"
+)
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--interval", type=float, default=0.05)
+@click.option("--threshold", type=float, default=0.1)
+@click.option("--capacity", type=int, default=100)
+@click.pass_context
+def loop_lag_install(
+    ctx,  # type: click.Context
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    interval,  # type: float
+    threshold,  # type: float
+    capacity,  # type: int
+):
+    # type: (...) -> None
+    result = _run_loop_lag(
+        ctx,
+        "install",
+        thread,
+        frame,
+        interval=interval,
+        threshold=threshold,
+        capacity=capacity,
+    )
+    if result is None:
+        return
+
+    if not result["installed"]:
+        click.echo("No running asyncio loop is found")
+    elif result["already_installed"]:
+        click.echo("The monitor is already installed")
+        _print_loop_lag(result)
+    else:
+        click.echo(
+            "Installed the monitor into {} loops".format(len(result["loops"]))
+        )
+
+
+@loop_lag_group.command(
+    name="pull", help="show stalls of the loops found by the monitor"
+)
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--clear", is_flag=True, default=False)
+@click.option("--output", "-o", type=click.Path(), default=None)
+@click.pass_context
+def loop_lag_pull(
+    ctx,  # type: click.Context
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    clear,  # type: bool
+    output,  # type: Optional[str]
+):
+    # type: (...) -> None
+    result = _run_loop_lag(ctx, "pull", thread, frame, clear=clear)
+    if result is None:
+        return
+
+    if not result["installed"]:
+        click.echo("The monitor is not installed")
+        return
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(result, f)
+
+    _print_loop_lag(result)
+
+
+@loop_lag_group.command(
+    name="uninstall", help="uninstall the monitor and show remaining stalls"
+)
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.pass_context
+def loop_lag_uninstall(ctx, thread, frame):
+    # type: (click.Context, Optional[int], Optional[int]) -> None
+    result = _run_loop_lag(ctx, "uninstall", thread, frame)
+    if result is None:
+        return
+
+    if "started_at" not in result:
+        click.echo("The monitor is not installed")
+        return
+
+    _print_loop_lag(result)
+    click.echo("Uninstalled the monitor")
 
 
 AVAILABLE_DEBUGGERS = [
@@ -176,33 +1332,101 @@ AVAILABLE_DEBUGGERS = [
 ]
 
 
+@cli.group(
+    name="agent",
+    help="manage the agent which serves in the process without stopping it",
+)
+@click.pass_context
+def agent_group(ctx):
+    # type: (click.Context) -> None
+    _require_process(ctx)
+
+
+@agent_group.command(help="install the agent into the process")
+@click.pass_context
+def install(ctx):
+    # type: (click.Context) -> None
+    with _get_session(ctx) as s:
+        info = agent.install(s.session, ctx.obj["pid"])
+
+    if info is None:
+        _print_result_message(None)
+        return
+
+    if info["already_installed"]:
+        click.echo("The agent is already installed")
+    else:
+        click.echo("Installed the agent")
+    click.echo(" - socket: {}".format(info["socket_path"]))
+
+
+@agent_group.command(help="uninstall the agent from the process")
+@click.pass_context
+def uninstall(ctx):
+    # type: (click.Context) -> None
+    with agent.connect(ctx.obj["pid"], ctx.obj["timeout"]) as proxy:
+        if proxy is None:
+            click.echo("The agent is not installed")
+            return
+        proxy.uninstall()
+
+    click.echo("Uninstalled the agent")
+
+
+@agent_group.command(help="show whether the agent is installed")
+@click.pass_context
+def status(ctx):
+    # type: (click.Context) -> None
+    with agent.connect(ctx.obj["pid"], ctx.obj["timeout"]) as proxy:
+        if proxy is None:
+            click.echo("The agent is not installed")
+            return
+        info = proxy.get_info()
+
+    click.echo("The agent is installed")
+    click.echo(" - socket: {}".format(info["socket_path"]))
+    click.echo(" - version: {}".format(info["version"]))
+    click.echo(" - python: {}".format(info["python_version"]))
+    click.echo(
+        " - installed at: {}".format(
+            time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(info["started_at"])
+            )
+        )
+    )
+
+
 @cli.command(help="attach a debugger to the running process")
 @click.option("--thread", type=int, default=None)
 @click.option("--frame", type=int, default=None)
 @click.option(
     "--debugger", type=click.Choice(AVAILABLE_DEBUGGERS), default=None
 )
+@click.option("--match", type=str, multiple=True)
 @click.pass_context
-def attach(ctx, thread, frame, debugger):
-    # type: (click.Context, Optional[int], Optional[int], Optional[str]) -> None
+def attach(
+    ctx,  # type: click.Context
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    debugger,  # type: Optional[str]
+    match,  # type: List[str]
+):
+    # type: (...) -> None
+    _require_process(ctx)
+    frame_filter = _get_frame_filter(None, None, match)
     debugger = debugger or "pdb"
     assert debugger in AVAILABLE_DEBUGGERS
 
     template_name = "attach_{}.py.template".format(debugger)
-    template_dir = shamiko._get_template_dir()
-    env = jinja2.Environment(
-        autoescape=False, loader=jinja2.FileSystemLoader(template_dir)
-    )
-    template = env.get_template(template_name)
+    script_path = session_utils.get_template_script(template_name)
     disposed = threading.Event()
 
-    with tempfile.TemporaryDirectory(prefix="shamiko_dbg_") as session_root:
-        socket_path = os.path.join(session_root, "proc.sock")
-        script_path = os.path.join(session_root, "script.py")
-
-        script = template.render(unix_socket_path=socket_path)
-        with open(script_path, "w") as f:
-            f.write(script)
+    with namespaces.SharedDirectory(ctx.obj["pid"], "shamiko_dbg_") as shared:
+        # NOTE: the socket is created by the process, so that it has to be
+        # placed where the process can write
+        socket_path = shared.result_host("proc.sock")
+        script_path = shared.stage(script_path)
+        params = {"unix_socket_path": shared.result_target("proc.sock")}
 
         def connect_stream():
             # type: () -> None
@@ -211,7 +1435,10 @@ def attach(ctx, thread, frame, debugger):
             max_counter = int(wait_sec / dt)
 
             for i in range(max_counter):
-                if os.path.exists(socket_path) or disposed.is_set():
+                if (
+                    shared.stat_result("proc.sock") is not None
+                    or disposed.is_set()
+                ):
                     break
 
                 if i % 10 == 0:
@@ -233,27 +1460,267 @@ def attach(ctx, thread, frame, debugger):
 
                 time.sleep(dt)
 
-        def impl(frame):
-            # type: (FrameWrapper) -> bool
-            try:
-                frame.run_file(script_path)
-            except Exception:
-                return False
-
-            return True
-
         t = threading.Thread(target=connect_stream)
         t.start()
         try:
-            ret = _run(ctx, impl, thread, frame)
-            if not ret:
+            with _get_session(ctx) as s:
+                target = s.session.run_file_in(
+                    thread,
+                    frame,
+                    script_path,
+                    params,
+                    frame_filter=frame_filter,
+                )
+            if target is None:
                 # show message only when traversing is failed
-                _print_result_message(ret)
+                _print_result_message(target)
         finally:
             disposed.set()
         t.join()
 
 
+@cli.standalone.command(
+    name="broadcast",
+    help="inject python code into every thread of processes",
+)
+@click.argument("file_path", type=click.Path(exists=True), required=False)
+@click.option("--script", "-s", type=str, default=None)
+@click.option("--pid", "-p", "pids", type=int, multiple=True)
+@click.option("--match", "-m", type=str, default=None)
+@click.option("--thread", type=int, default=None)
+@click.option("--frame", type=int, default=None)
+@click.option("--jobs", "-j", type=int, default=8)
+@click.option("--timeout", "-t", type=float, default=None)
+@click.option("--json", "as_json", is_flag=True, default=False)
+def broadcast_command(
+    file_path,  # type: Optional[str]
+    script,  # type: Optional[str]
+    pids,  # type: List[int]
+    match,  # type: Optional[str]
+    thread,  # type: Optional[int]
+    frame,  # type: Optional[int]
+    jobs,  # type: int
+    timeout,  # type: Optional[float]
+    as_json,  # type: bool
+):
+    # type: (...) -> None
+    if (file_path is None) == (script is None):
+        raise click.UsageError("Either FILE_PATH or --script is required")
+    if file_path is not None:
+        with open(file_path) as f:
+            source = f.read()
+        filename = os.path.abspath(file_path)
+    else:
+        assert script is not None
+        source = script
+        filename = "<broadcast>"
+
+    targets = list(pids)
+    if match is not None:
+        targets.extend(
+            info.pid for info in discovery.scan(match) if info.pid not in pids
+        )
+    if len(targets) == 0:
+        raise click.UsageError("No process is specified by --pid or --match")
+
+    results = broadcast.run(
+        targets,
+        source,
+        filename,
+        thread,
+        frame,
+        max_workers=jobs,
+        timeout=timeout,
+    )
+    summary = broadcast.summarize(results)
+
+    if as_json:
+        click.echo(
+            json.dumps(
+                {
+                    "summary": summary,
+                    "results": [r.to_dict() for r in results],
+                },
+                indent=2,
+            )
+        )
+        return
+
+    for r in results:
+        if r.num is None:
+            click.echo("=== [pid={}] ===".format(r.pid))
+        else:
+            click.echo(
+                "=== [pid={}, num={}, lwp={}, name={}, frame={}] ===".format(
+                    r.pid, r.num, r.lwp, r.name, r.frame
+                )
+            )
+        if r.succeeded:
+            assert r.result is not None
+            click.echo(
+                r.result["value"]
+                if r.result["is_repr"]
+                else json.dumps(r.result["value"])
+            )
+        else:
+            click.echo("ERROR: {}".format(r.error))
+
+    click.echo(
+        "=== Summary: {processes} processes, {targets} targets, "
+        "{succeeded} succeeded, {failed} failed ===".format(**summary)
+    )
+
+
+def _print_stack(stack):
+    # type: (Dict[str, Any]) -> None
+    click.echo(
+        "=== Thread [num={}, lwp={}, name={}] {} ===".format(
+            stack["num"],
+            stack["ptid"][1],
+            stack["name"],
+            _describe_thread_state(stack),
+        )
+    )
+    for frame in stack["frames"]:
+        click.echo(_format_frame(frame))
+        for name, value in frame.get("locals", []):
+            click.echo("       {} = {}".format(name, value))
+
+
+@cli.standalone.command(help="view a snapshot saved by snapshot command")
+@click.argument("file_path", type=click.Path(exists=True))
+@click.option("--thread", "threads", type=int, multiple=True)
+@click.option("--all", "show_all", is_flag=True, default=False)
+def view(file_path, threads, show_all):
+    # type: (str, List[int], bool) -> None
+    with StackSnapshot.load(file_path) as snap:
+        process = snap.process
+        click.echo(
+            "=== Snapshot of pid={} on {} at {} (captured in {:.3f}s) ===".format(
+                process["pid"],
+                snap.hostname,
+                time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.localtime(snap.timestamp)
+                ),
+                snap.elapsed,
+            )
+        )
+        for key in ("exe", "cmdline", "cwd", "python_version", "rss"):
+            if key in process:
+                click.echo(" - {}: {}".format(key, process[key]))
+
+        if show_all:
+            threads = [entry["num"] for entry in snap.threads]
+        if len(threads) == 0:
+            click.echo(
+                "{:>5} {:>8} {:>7}  {:<28} {}".format(
+                    "num", "lwp", "frames", "state", "name / top frame"
+                )
+            )
+            for entry in snap.threads:
+                click.echo(
+                    "{:>5} {:>8} {:>7}  {:<28} {}".format(
+                        entry["num"],
+                        entry["lwp"],
+                        entry["frames"],
+                        _describe_thread_state(entry),
+                        entry["name"],
+                    )
+                )
+                if entry["top"] is not None:
+                    click.echo("   * {}".format(entry["top"]))
+            return
+
+        for num in threads:
+            stack = snap.get_stack(num)
+            if stack is None:
+                click.echo("Thread num={} is not found".format(num))
+                continue
+            _print_stack(stack)
+
+
+@cli.standalone.command(help="list running python processes")
+@click.option("--match", "-m", type=str, default=None)
+@click.option("--quiet", "-q", is_flag=True, default=False)
+def ps(match, quiet):
+    # type: (Optional[str], bool) -> None
+    processes = discovery.scan(match)
+    if quiet:
+        for info in processes:
+            click.echo(info.pid)
+        return
+
+    click.echo(
+        "{:>8} {:>8} {:>10} {:>7}  {}".format(
+            "PID", "THREADS", "RSS(MB)", "PYTHON", "COMMAND"
+        )
+    )
+    for info in processes:
+        click.echo(
+            "{:>8} {:>8} {:>10.1f} {:>7}  {}".format(
+                info.pid,
+                info.num_threads,
+                info.rss / (1024.0 * 1024.0),
+                info.python_version or "?",
+                info.command,
+            )
+        )
+
+
+@cli.standalone.group(name="cache", help="manage the per-executable cache")
+def cache_group():
+    # type: () -> None
+    pass  # NOQA
+
+
+@cache_group.command(
+    name="warm", help="build the symbol index of a python executable"
+)
+@click.option("--pid", "-p", type=int, default=None)
+@click.option("--executable", "-e", type=str, default=None)
+def cache_warm(pid, executable):
+    # type: (Optional[int], Optional[str]) -> None
+    if executable is None:
+        if pid is None:
+            raise click.UsageError("--pid or --executable is required")
+        executable = proc_utils.guess_executable(pid)
+        if executable is None:
+            raise click.ClickException("Failed to guess executable")
+
+    click.echo("Building symbol index of {}...".format(executable))
+    started_at = time.time()
+    entry = symbol_cache.warm(executable, pid)
+    click.echo("Done in {:.1f}s".format(time.time() - started_at))
+    _print_cache_entry(entry)
+
+
+@cache_group.command(name="list", help="show cached executables")
+def cache_list():
+    # type: () -> None
+    click.echo(
+        "index cache directory: {}".format(symbol_cache.get_index_cache_dir())
+    )
+    for entry in symbol_cache.list_entries():
+        _print_cache_entry(entry)
+
+
+@cache_group.command(name="clear", help="remove cached executables")
+def cache_clear():
+    # type: () -> None
+    symbol_cache.clear()
+    click.echo("Cleared")
+
+
+def _print_cache_entry(entry):
+    # type: (Dict[str, Any]) -> None
+    fmt = """=== {executable} ===
+ - build_id: {build_id}
+ - libpython: {libpython}
+ - helpers: {helpers}
+ - warmed: {warmed}"""
+    click.echo(fmt.format(**entry))
+
+
 def _launch_ipshell(pid, session):
     # type: (int, GdbWrapper) -> None
     from IPython.terminal.embed import InteractiveShellEmbed
@@ -0,0 +1,162 @@
+import os
+import re
+from typing import Dict, List, Optional
+
+_PYTHON_EXE_PATTERN = re.compile(r"^python(\d+(\.\d+)?)?[dmu]*$")
+_LIBPYTHON_PATTERN = re.compile(r"libpython(\d+\.\d+)[dmu]*\.so")
+_KB = 1024
+_DELETED_SUFFIX = " (deleted)"
+
+
+def _read(path):
+    # type: (str) -> Optional[str]
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _readlink(path):
+    # type: (str) -> Optional[str]
+    try:
+        target = os.readlink(path)
+    except (IOError, OSError):
+        return None
+
+    # NOTE: the kernel appends the suffix when the file has been removed or
+    # replaced (e.g. python was upgraded while the process is running)
+    if target.endswith(_DELETED_SUFFIX) and not os.path.exists(target):
+        target = target[: -len(_DELETED_SUFFIX)]
+
+    return target
+
+
+def _parse_status(content):
+    # type: (str) -> Dict[str, str]
+    status = {}
+    for line in content.splitlines():
+        key, _, value = line.partition(":")
+        status[key] = value.strip()
+
+    return status
+
+
+def find_libpython(pid):
+    # type: (int) -> Optional[str]
+    try:
+        with open("/proc/{}/maps".format(pid)) as f:
+            for line in f:
+                if "libpython" not in line:
+                    continue
+                fields = line.split()
+                if len(fields) >= 6 and _LIBPYTHON_PATTERN.search(fields[5]):
+                    return fields[5]
+    except (IOError, OSError):
+        pass  # NOQA
+
+    return None
+
+
+class ProcessInfo:
+    def __init__(
+        self,
+        pid,  # type: int
+        name,  # type: str
+        exe,  # type: Optional[str]
+        cmdline,  # type: List[str]
+        cwd,  # type: Optional[str]
+        num_threads,  # type: int
+        rss,  # type: int
+        libpython,  # type: Optional[str]
+    ):
+        # type: (...) -> None
+        self.pid = pid
+        self.name = name
+        self.exe = exe
+        self.cmdline = cmdline
+        self.cwd = cwd
+        self.num_threads = num_threads
+        self.rss = rss
+        self.libpython = libpython
+
+    @property
+    def is_python(self):
+        # type: () -> bool
+        if self.libpython is not None:
+            return True
+        if self.exe is None:
+            return False
+
+        return bool(_PYTHON_EXE_PATTERN.match(os.path.basename(self.exe)))
+
+    @property
+    def python_version(self):
+        # type: () -> Optional[str]
+        if self.libpython is not None:
+            m = _LIBPYTHON_PATTERN.search(self.libpython)
+            if m:
+                return m.group(1)
+        if self.exe is not None:
+            m = _PYTHON_EXE_PATTERN.match(os.path.basename(self.exe))
+            if m and m.group(1):
+                return m.group(1)
+
+        return None
+
+    @property
+    def command(self):
+        # type: () -> str
+        if len(self.cmdline) > 0:
+            return " ".join(self.cmdline)
+
+        return "[{}]".format(self.name)
+
+
+def get_process_info(pid, with_maps=True):
+    # type: (int, bool) -> Optional[ProcessInfo]
+    proc_dir = "/proc/{}".format(pid)
+    status_content = _read(os.path.join(proc_dir, "status"))
+    if status_content is None:
+        return None
+
+    status = _parse_status(status_content)
+    cmdline = (_read(os.path.join(proc_dir, "cmdline")) or "").split("\0")
+    rss_kb = status.get("VmRSS", "0 kB").split()[0]
+
+    return ProcessInfo(
+        pid=pid,
+        name=status.get("Name", ""),
+        exe=_readlink(os.path.join(proc_dir, "exe")),
+        cmdline=[arg for arg in cmdline if arg],
+        cwd=_readlink(os.path.join(proc_dir, "cwd")),
+        num_threads=int(status.get("Threads", "0")),
+        rss=int(rss_kb) * _KB,
+        libpython=find_libpython(pid) if with_maps else None,
+    )
+
+
+def list_pids():
+    # type: () -> List[int]
+    return sorted(int(name) for name in os.listdir("/proc") if name.isdigit())
+
+
+def scan(pattern=None, include_self=False):
+    # type: (Optional[str], bool) -> List[ProcessInfo]
+    regex = re.compile(pattern) if pattern is not None else None
+    own_pid = os.getpid()
+
+    result = []
+    for pid in list_pids():
+        if pid == own_pid and not include_self:
+            continue
+
+        info = get_process_info(pid)
+        if info is None or not info.is_python:
+            continue
+        if regex is not None and not regex.search(info.command):
+            continue
+
+        result.append(info)
+
+    return result
@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import time
+from typing import Any, Dict, Optional
+
+import shamiko.discovery
+import shamiko.namespaces
+
+_FREEZE_TIME_PREFIX = "shamiko-freeze-time: "
+
+
+def get_metadata_path(core_path):
+    # type: (str) -> str
+    return core_path + ".json"
+
+
+def load_metadata(core_path):
+    # type: (str) -> Optional[Dict[str, Any]]
+    try:
+        with open(get_metadata_path(core_path)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def generate(pid, output):
+    # type: (int, str) -> Dict[str, Any]
+    # NOTE: the process is stopped only from attach to detach. Shared
+    # libraries aren't loaded since gcore doesn't need their symbols, which
+    # makes attaching much faster.
+    output = os.path.abspath(output)
+    info = shamiko.discovery.get_process_info(pid, with_maps=False)
+    command = ["gdb", "-q", "-batch"]
+    command.extend(shamiko.namespaces.get_gdb_options(pid))
+    command.extend(
+        [
+            "-iex",
+            "set auto-solib-add off",
+            "-ex",
+            "py import time; __shamiko_attached_at = time.time()",
+            "-ex",
+            "attach {}".format(pid),
+            "-ex",
+            "gcore {}".format(output),
+            "-ex",
+            "detach",
+            "-ex",
+            "py print({!r} + str(time.time() - __shamiko_attached_at))".format(
+                _FREEZE_TIME_PREFIX
+            ),
+        ]
+    )
+
+    started_at = time.time()
+    proc = subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    elapsed = time.time() - started_at
+
+    freeze_time = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(_FREEZE_TIME_PREFIX):
+            freeze_time = float(line[len(_FREEZE_TIME_PREFIX) :])
+
+    if not os.path.exists(output):
+        raise RuntimeError("Failed to generate core:\n" + proc.stdout)
+
+    metadata = {
+        "pid": pid,
+        "core": output,
+        "executable": None,
+        "context_directory": None,
+        "timestamp": started_at,
+        "elapsed": elapsed,
+        "freeze_time": freeze_time,
+        "size": os.path.getsize(output),
+    }
+    if info is not None:
+        if info.exe is not None:
+            metadata["executable"] = shamiko.namespaces.resolve_path(
+                pid, info.exe
+            )
+        if info.cwd is not None:
+            metadata["context_directory"] = shamiko.namespaces.resolve_path(
+                pid, info.cwd
+            )
+
+    with open(get_metadata_path(output), "w") as f:
+        json.dump(metadata, f)
+
+    return metadata
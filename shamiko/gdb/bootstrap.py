@@ -0,0 +1,10 @@
+import os
+
+from shamiko.gdb.server import create_server
+
+
+def main(session_dir):
+    # type: (str) -> None
+    socket_path = os.path.join(session_dir, "session.sock")
+    server = create_server(socket_path, session_dir)
+    server.start()
@@ -1,11 +1,25 @@
+import os
+import signal
+
 import shamiko.gdb.wrapper
 import shamiko.simple_rpc.server
 
 
+def _interrupt_gdb():
+    # type: () -> None
+    # NOTE: gdb stops the inferior on SIGINT as Ctrl-C does. A function call
+    # in the inferior is unwound since `unwindonsignal` is enabled.
+    os.kill(os.getpid(), signal.SIGINT)
+
+
 def create_server(socket_path, session_dir):
     # type: (str, str) -> shamiko.simple_rpc.server.RPCServer
 
-    server = shamiko.simple_rpc.server.RPCServer(socket_path)
+    # NOTE: gdb exits, i.e. detaches from the process, when the client is
+    # gone, so that the process isn't left stopped
+    server = shamiko.simple_rpc.server.RPCServer(
+        socket_path, interrupt=_interrupt_gdb, terminate_on_disconnect=True
+    )
     server.register(shamiko.gdb.wrapper.GdbWrapper)
     server.register(shamiko.gdb.wrapper.InferiorWrapper)
     server.register(shamiko.gdb.wrapper.ThreadWrapper)
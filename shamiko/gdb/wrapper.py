@@ -1,12 +1,27 @@
+import fnmatch
+import os
 import sys
-from typing import Any, List, Optional, Tuple, Union
-
-import six
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import gdb
 
-python_dbg_module = sys.modules["__main__"]
-PyFrame = python_dbg_module.Frame
+
+def PyFrame(gdb_frame):
+    # type: (Any) -> Any
+    # NOTE: the python-gdb helper is looked up lazily since it is loaded
+    # with the objfile of python, which may be after this module is imported
+    # (e.g. a pooled gdb attaches later)
+    return sys.modules["__main__"].Frame(gdb_frame)
 
 
 def _gdb_execute(command):
@@ -27,14 +42,689 @@ def _get_frame_index(frame):
     return index
 
 
+def _describe_python_frame(frame, index):
+    # type: (Any, int) -> Dict[str, Any]
+    entry = {
+        "index": index,
+        "kind": "python",
+        "filename": None,
+        "line": None,
+        "function": None,
+        "description": None,
+        "library": None,
+        "address": None,
+    }  # type: Dict[str, Any]
+
+    if frame.is_evalframe():
+        entry["description"] = "(unable to read python frame information)"
+        try:
+            pyop = frame.get_pyop()
+            entry["filename"] = pyop.filename()
+            entry["line"] = pyop.current_line_num()
+            entry["function"] = pyop.co_name.proxyval(set())
+            entry["description"] = None
+        except Exception:
+            pass  # NOQA
+    else:
+        info = frame.is_other_python_frame()
+        entry["description"] = info if info else "(Unknown Frame)"
+
+    return entry
+
+
+def _describe_native_frame(gdb_frame, index):
+    # type: (Any, int) -> Dict[str, Any]
+    entry = {
+        "index": index,
+        "kind": "native",
+        "filename": None,
+        "line": None,
+        "function": gdb_frame.name(),
+        "description": None,
+        "library": None,
+        "address": None,
+    }  # type: Dict[str, Any]
+
+    try:
+        pc = gdb_frame.pc()
+        entry["address"] = pc
+        entry["library"] = (
+            gdb.solib_name(pc) or gdb.current_progspace().filename
+        )
+    except Exception:
+        pass  # NOQA
+
+    return entry
+
+
+def _normalize_symbol(name):
+    # type: (str) -> str
+    # NOTE: glibc exports aliases such as `__GI___poll` or `__libc_recv`
+    name = name.lstrip("_")
+    for prefix in ("GI_", "libc_"):
+        if name.startswith(prefix):
+            name = name[len(prefix) :].lstrip("_")
+
+    return name
+
+
+def _capture_locals(frame, repr_max_len):
+    # type: (Any, int) -> List[List[str]]
+    result = []
+    try:
+        for pyop_name, pyop_value in frame.get_pyop().iter_locals():
+            result.append(
+                [
+                    pyop_name.proxyval(set()),
+                    pyop_value.get_truncated_repr(repr_max_len),
+                ]
+            )
+    except Exception:
+        pass  # NOQA
+
+    return result
+
+
+def _create_frame_filter(
+    thread_num=None,  # type: Optional[int]
+    frame_index=None,  # type: Optional[int]
+    frame_filter=None,  # type: Optional[Dict[str, Any]]
+):
+    # type: (...) -> Dict[str, Any]
+    # NOTE: a filter is a dict which may have the following keys, and is
+    # evaluated here so that unmatched frames aren't sent to the client
+    #   thread_num, thread_name (glob), lwps (list), frame_index,
+    #   filename (glob), function (glob), max_depth
+    spec = dict(frame_filter or {})
+    if thread_num is not None:
+        spec["thread_num"] = thread_num
+    if frame_index is not None:
+        spec["frame_index"] = frame_index
+
+    return spec
+
+
+def _match_pattern(value, pattern):
+    # type: (Optional[str], Optional[str]) -> bool
+    if pattern is None:
+        return True
+
+    return value is not None and fnmatch.fnmatchcase(value, pattern)
+
+
+def _match_thread(thread, spec):
+    # type: (Any, Dict[str, Any]) -> bool
+    thread_num = spec.get("thread_num", None)
+    if thread_num is not None and thread.num != thread_num:
+        return False
+
+    lwps = spec.get("lwps", None)
+    if lwps is not None and thread.ptid[1] not in lwps:
+        return False
+
+    return _match_pattern(thread.name, spec.get("thread_name", None))
+
+
+def _has_frame_pattern(spec):
+    # type: (Dict[str, Any]) -> bool
+    # NOTE: patterns require reading the code object of each frame
+    return any(
+        spec.get(key, None) is not None for key in ("filename", "function")
+    )
+
+
+def _match_frame(entry, spec):
+    # type: (Dict[str, Any], Dict[str, Any]) -> bool
+    frame_index = spec.get("frame_index", None)
+    if frame_index is not None and entry["index"] != frame_index:
+        return False
+
+    return _match_pattern(
+        entry["filename"], spec.get("filename", None)
+    ) and _match_pattern(entry["function"], spec.get("function", None))
+
+
+def _get_last_index(spec):
+    # type: (Dict[str, Any]) -> Optional[int]
+    # NOTE: frames older than this index never match
+    limits = [
+        spec[key]
+        for key in ("frame_index", "max_depth")
+        if spec.get(key, None) is not None
+    ]
+    return min(limits) if len(limits) > 0 else None
+
+
+def _capture_frames(
+    include_native=False,  # type: bool
+    local_frames=0,  # type: int
+    repr_max_len=128,  # type: int
+    spec=None,  # type: Optional[Dict[str, Any]]
+):
+    # type: (...) -> Tuple[List[Dict[str, Any]], List[str]]
+    spec = spec or {}
+    last_index = _get_last_index(spec)
+    result = []
+    # NOTE: native symbols above the innermost python frame, which tell us
+    # what the thread is blocked on
+    blocking_symbols = []  # type: List[str]
+    found_evalframe = False
+    # NOTE: indices are compatible with FrameWrapper.get_index
+    index = 1
+    frame = PyFrame(gdb.newest_frame())
+    while frame:
+        if last_index is not None and index > last_index:
+            break
+        try:
+            if not found_evalframe:
+                if frame.is_evalframe():
+                    found_evalframe = True
+                elif frame._gdbframe.name():
+                    blocking_symbols.append(
+                        _normalize_symbol(frame._gdbframe.name())
+                    )
+
+            entry = None
+            if frame.is_python_frame():
+                entry = _describe_python_frame(frame, index)
+            elif include_native:
+                entry = _describe_native_frame(frame._gdbframe, index)
+
+            if entry is not None and _match_frame(entry, spec):
+                # NOTE: locals are captured only for the innermost frames
+                if local_frames > 0 and frame.is_evalframe():
+                    entry["locals"] = _capture_locals(frame, repr_max_len)
+                    local_frames -= 1
+                result.append(entry)
+        except Exception:
+            pass  # NOQA
+        frame = frame.older()
+        index += 1
+
+    return result, blocking_symbols
+
+
+def _iter_target_threads(spec):
+    # type: (Dict[str, Any]) -> Iterator[Any]
+    # NOTE: yields matched threads with the thread switched, so that callers
+    # can walk and inject code into its frames
+    threads = sorted(gdb.selected_inferior().threads(), key=lambda t: t.num)
+    for thread in threads:
+        if not _match_thread(thread, spec):
+            continue
+        if not thread.is_valid():
+            continue
+
+        thread.switch()
+        yield thread
+
+
+def _iter_python_frames(spec):
+    # type: (Dict[str, Any]) -> Iterator[Tuple[Any, int]]
+    last_index = _get_last_index(spec)
+    frame_index = spec.get("frame_index", None)
+    index = 1
+    frame = PyFrame(gdb.newest_frame())
+    while frame:
+        if last_index is not None and index > last_index:
+            break
+        if frame_index is None or index == frame_index:
+            try:
+                matched = frame.is_python_frame() and (
+                    not _has_frame_pattern(spec)
+                    or _match_frame(_describe_python_frame(frame, index), spec)
+                )
+            except Exception:
+                matched = False
+            if matched:
+                yield frame, index
+
+        frame = frame.older()
+        index += 1
+
+
+def _iter_target_frames(spec):
+    # type: (Dict[str, Any]) -> Iterator[Tuple[Any, Any, int]]
+    for thread in _iter_target_threads(spec):
+        for frame, index in _iter_python_frames(spec):
+            yield thread, frame, index
+
+
+def _inject_into_first(
+    candidates,  # type: Iterable[Tuple[Any, Any, int]]
+    func,  # type: Callable[[FrameWrapper], None]
+):
+    # type: (...) -> Optional[List[int]]
+    for thread, frame, index in candidates:
+        try:
+            frame.select()
+            func(FrameWrapper(frame))
+        except Exception:
+            # NOTE: gdb couldn't call into the process from this frame,
+            # so that nothing has run yet
+            continue
+
+        # NOTE: once called, the code has run even if it failed in the
+        # process, and it isn't run again in other frames since it may have
+        # side effects. Callers tell a failure by a missing result.
+        return [thread.num, index]
+
+    return None
+
+
+THREAD_STATE_RUNNING = "running"
+THREAD_STATE_GIL_WAIT = "gil-wait"
+THREAD_STATE_LOCK_WAIT = "lock-wait"
+THREAD_STATE_IO_WAIT = "io-wait"
+THREAD_STATE_IDLE = "idle"
+
+_GIL_WAIT_SYMBOLS = frozenset(["take_gil"])
+_LOCK_WAIT_SYMBOLS = frozenset(
+    [
+        "PyThread_acquire_lock",
+        "PyThread_acquire_lock_timed",
+        "PyMutex_LockTimed",
+        "sem_wait",
+        "sem_timedwait",
+        "sem_clockwait",
+        "new_sem_wait_slow",
+        "new_sem_wait_slow64",
+        "do_futex_wait",
+        "futex_wait",
+        "futex_abstimed_wait_common",
+        "futex_abstimed_wait_common64",
+        "pthread_cond_wait",
+        "pthread_cond_timedwait",
+        "pthread_cond_clockwait",
+        "pthread_mutex_lock",
+        "lll_lock_wait",
+    ]
+)
+_IO_WAIT_SYMBOLS = frozenset(
+    [
+        "select",
+        "pselect",
+        "pselect6",
+        "poll",
+        "ppoll",
+        "epoll_wait",
+        "epoll_pwait",
+        "read",
+        "readv",
+        "pread64",
+        "recv",
+        "recvfrom",
+        "recvmsg",
+        "accept",
+        "accept4",
+        "connect",
+        "write",
+        "writev",
+        "send",
+        "sendto",
+        "sendmsg",
+        "waitpid",
+        "wait4",
+        "waitid",
+    ]
+)
+_IDLE_SYMBOLS = frozenset(
+    [
+        "nanosleep",
+        "clock_nanosleep",
+        "usleep",
+        "sleep",
+        "pause",
+        "sigwait",
+        "sigwaitinfo",
+        "sigtimedwait",
+    ]
+)
+
+
+def _classify_thread(blocking_symbols, has_python_frame, holds_gil):
+    # type: (List[str], bool, bool) -> str
+    if holds_gil:
+        return THREAD_STATE_RUNNING
+
+    symbols = set(blocking_symbols)
+    # NOTE: the order matters since waiting for GIL also waits on a lock
+    if symbols & _GIL_WAIT_SYMBOLS:
+        return THREAD_STATE_GIL_WAIT
+    if symbols & _LOCK_WAIT_SYMBOLS:
+        return THREAD_STATE_LOCK_WAIT
+    if symbols & _IO_WAIT_SYMBOLS:
+        return THREAD_STATE_IO_WAIT
+    if symbols & _IDLE_SYMBOLS or not has_python_frame:
+        return THREAD_STATE_IDLE
+
+    return THREAD_STATE_RUNNING
+
+
+def _read_atomic(value, field_name):
+    # type: (Any, str) -> Any
+    field = value[field_name]
+    try:
+        # NOTE: _Py_atomic_int and _Py_atomic_address wrap the value
+        return field["_value"]
+    except gdb.error:
+        return field
+
+
+_GIL_EXPRESSIONS = [
+    # Python 3.12+
+    "_PyRuntime.interpreters.main->ceval.gil",
+    # Python 3.7 - 3.11
+    "_PyRuntime.ceval.gil",
+]
+
+
+def _get_gil_holder():
+    # type: () -> Optional[Any]
+    locked = None
+    holder = None
+    for expression in _GIL_EXPRESSIONS:
+        try:
+            gil = gdb.parse_and_eval(expression)
+            if gil.type.code == gdb.TYPE_CODE_PTR:
+                gil = gil.dereference()
+            locked = _read_atomic(gil, "locked")
+            holder = _read_atomic(gil, "last_holder")
+            break
+        except gdb.error:
+            continue
+    else:
+        try:
+            # Python 3.6 and older
+            locked = gdb.parse_and_eval("gil_locked")["_value"]
+            holder = gdb.parse_and_eval("gil_last_holder")["_value"]
+        except gdb.error:
+            return None
+
+    if int(locked) <= 0 or int(holder) == 0:
+        return None
+
+    return holder.cast(gdb.lookup_type("PyThreadState").pointer())
+
+
+def _get_thread_ident(thread):
+    # type: (Any) -> Optional[int]
+    try:
+        handle = bytearray(thread.handle())
+    except Exception:
+        return None
+
+    if sys.byteorder == "big":
+        handle.reverse()
+
+    ident = 0
+    for i, b in enumerate(handle):
+        ident |= b << (8 * i)
+    return ident
+
+
+def _get_gil_holder_lwp(threads):
+    # type: (List[Any]) -> Optional[int]
+    try:
+        tstate = _get_gil_holder()
+    except Exception:
+        return None
+
+    if tstate is None:
+        return None
+
+    try:
+        # Python 3.8+
+        return int(tstate["native_thread_id"])
+    except gdb.error:
+        pass  # NOQA
+
+    ident = int(tstate["thread_id"])
+    for thread in threads:
+        if _get_thread_ident(thread) == ident:
+            return thread.ptid[1]
+
+    return None
+
+
+def _cast_object(address, type_name):
+    # type: (int, str) -> Any
+    pointer_type = gdb.lookup_type(type_name).pointer()
+    return gdb.Value(address).cast(pointer_type).dereference()
+
+
+def _read_value(address, type_name):
+    # type: (int, str) -> int
+    return int(_cast_object(address, type_name))
+
+
+def _read_pointer(address):
+    # type: (int) -> int
+    pointer_type = gdb.lookup_type("void").pointer()
+    return int(gdb.Value(address).cast(pointer_type.pointer()).dereference())
+
+
+_MEMORYVIEW_C = 0x002
+_MEMORYVIEW_FORTRAN = 0x004
+_NPY_ARRAY_C_CONTIGUOUS = 0x0001
+_NPY_ARRAY_F_CONTIGUOUS = 0x0002
+# NOTE: NPY_DATETIMEUNIT, where 3 is a gap for the removed business day
+_NPY_DATETIME_UNITS = [
+    "Y",
+    "M",
+    "W",
+    "",
+    "D",
+    "h",
+    "m",
+    "s",
+    "ms",
+    "us",
+    "ns",
+    "ps",
+    "fs",
+    "as",
+    "generic",
+]
+
+
+def _locate_unicode(address):
+    # type: (int) -> Dict[str, Any]
+    try:
+        ascii_type = gdb.lookup_type("PyASCIIObject")
+    except gdb.error:
+        # Python 2: str is a byte string
+        obj = _cast_object(address, "PyStringObject")
+        return {
+            "type": "bytes",
+            "address": int(obj["ob_sval"].address),
+            "length": int(obj["ob_size"]),
+        }
+
+    obj = _cast_object(address, "PyASCIIObject")
+    state = obj["state"]
+    kind = int(state["kind"])
+    if int(state["compact"]):
+        # NOTE: characters follow the header of compact strings
+        if int(state["ascii"]):
+            data = address + ascii_type.sizeof
+        else:
+            data = address + gdb.lookup_type("PyCompactUnicodeObject").sizeof
+    else:
+        data = int(_cast_object(address, "PyUnicodeObject")["data"]["any"])
+
+    suffix = "-le" if sys.byteorder == "little" else "-be"
+    encoding = {1: "latin-1", 2: "utf-16" + suffix, 4: "utf-32" + suffix}
+    return {
+        "type": "str",
+        "address": data,
+        "length": int(obj["length"]) * kind,
+        "encoding": encoding[kind],
+    }
+
+
+def _read_ndarray_descr(descr):
+    # type: (int) -> Tuple[int, str]
+    # NOTE: returns the item size and the typestr of PyArray_Descr. Fields
+    # after `type_num` differ between numpy 1.x and 2.x:
+    #   1.x: int elsize, int alignment, 5 pointers, NpyAuxData *c_metadata
+    #   2.x: npy_uint64 flags, npy_intp elsize, 7 pointer-sized fields,
+    #        ..., NpyAuxData *c_metadata
+    # `alignment` of 1.x is never 0, while upper bits of `flags` of 2.x are
+    # always 0, so that a half of the 8 bytes being 0 means 2.x.
+    pointer_size = gdb.lookup_type("void").pointer().sizeof
+    chars = descr + gdb.lookup_type("PyObject").sizeof + pointer_size
+    kind, _, byteorder = [
+        chr(_read_value(chars + i, "unsigned char")) for i in range(3)
+    ]
+    if kind == "O":
+        raise RuntimeError("ndarray of objects is not supported")
+    if byteorder == "=":
+        byteorder = "<" if sys.byteorder == "little" else ">"
+
+    halves = [_read_value(chars + 8 + i * 4, "unsigned int") for i in (0, 1)]
+    if 0 in halves:
+        elsize = _read_value(chars + 16, "Py_ssize_t")
+        c_metadata = chars + 16 + 9 * pointer_size
+    else:
+        elsize = halves[0]
+        c_metadata = chars + 16 + 5 * pointer_size
+
+    if kind == "U":
+        # NOTE: UCS4, while the typestr counts characters
+        return elsize, "{}U{}".format(byteorder, elsize // 4)
+
+    if kind in ("M", "m"):
+        # NOTE: the unit is kept in PyArray_DatetimeMetaData following the
+        # 4 pointers of NpyAuxData
+        meta = _read_pointer(c_metadata) + 4 * pointer_size
+        unit = _read_value(meta, "int")
+        num = _read_value(meta + 4, "int")
+        if not 0 <= unit < len(_NPY_DATETIME_UNITS):
+            raise RuntimeError("Unknown datetime unit: {}".format(unit))
+        if _NPY_DATETIME_UNITS[unit] == "generic":
+            return elsize, "{}{}{}".format(byteorder, kind, elsize)
+
+        return elsize, "{}{}{}[{}{}]".format(
+            byteorder,
+            kind,
+            elsize,
+            num if num != 1 else "",
+            _NPY_DATETIME_UNITS[unit],
+        )
+
+    return elsize, "{}{}{}".format(byteorder, kind, elsize)
+
+
+def _locate_ndarray(address):
+    # type: (int) -> Dict[str, Any]
+    # NOTE: numpy is usually built without debug symbols, so that fields of
+    # PyArrayObject are read by their offsets, which are the same in numpy
+    # 1.x and 2.x
+    pointer_size = gdb.lookup_type("void").pointer().sizeof
+    base = address + gdb.lookup_type("PyObject").sizeof
+    data = _read_pointer(base)
+    nd = _read_value(base + pointer_size, "int")
+    dimensions = _read_pointer(base + 2 * pointer_size)
+    descr = _read_pointer(base + 5 * pointer_size)
+    flags = _read_value(base + 6 * pointer_size, "int")
+
+    shape = [
+        _read_value(dimensions + i * pointer_size, "Py_ssize_t")
+        for i in range(nd)
+    ]
+
+    c_contiguous = bool(flags & _NPY_ARRAY_C_CONTIGUOUS)
+    f_contiguous = bool(flags & _NPY_ARRAY_F_CONTIGUOUS)
+    if not (c_contiguous or f_contiguous):
+        raise RuntimeError("non-contiguous ndarray is not supported")
+
+    elsize, dtype = _read_ndarray_descr(descr)
+    length = elsize
+    for size in shape:
+        length *= size
+
+    return {
+        "type": "ndarray",
+        "address": data,
+        "length": length,
+        "dtype": dtype,
+        "shape": shape,
+        "fortran_order": f_contiguous and not c_contiguous,
+    }
+
+
+def _locate_buffer(address, type_name):
+    # type: (int, str) -> Dict[str, Any]
+    # NOTE: returns the address and the length of contiguous memory which
+    # holds the content of the object
+    if type_name == "bytes":
+        obj = _cast_object(address, "PyBytesObject")
+        return {
+            "type": "bytes",
+            "address": int(obj["ob_sval"].address),
+            "length": int(obj["ob_base"]["ob_size"]),
+        }
+    elif type_name == "bytearray":
+        obj = _cast_object(address, "PyByteArrayObject")
+        try:
+            # Python 3.4+
+            start = obj["ob_start"]
+        except gdb.error:
+            start = obj["ob_bytes"]
+        return {
+            "type": "bytearray",
+            "address": int(start),
+            "length": int(obj["ob_base"]["ob_size"]),
+        }
+    elif type_name == "str":
+        return _locate_unicode(address)
+    elif type_name == "memoryview":
+        obj = _cast_object(address, "PyMemoryViewObject")
+        if not int(obj["flags"]) & (_MEMORYVIEW_C | _MEMORYVIEW_FORTRAN):
+            raise RuntimeError("non-contiguous memoryview is not supported")
+        view = obj["view"]
+        return {
+            "type": "memoryview",
+            "address": int(view["buf"]),
+            "length": int(view["len"]),
+            "format": view["format"].string() if int(view["format"]) else "B",
+            "itemsize": int(view["itemsize"]),
+        }
+    elif type_name == "numpy.ndarray":
+        return _locate_ndarray(address)
+
+    raise RuntimeError("Unsupported type: {}".format(type_name))
+
+
+def _locate_variable_buffer(frame, variable_name):
+    # type: (Any, str) -> Optional[Dict[str, Any]]
+    pyop = frame.get_pyop()
+    if not pyop:
+        return None
+
+    pyop_var, scope = pyop.get_var_by_name(variable_name)
+    if not pyop_var:
+        return None
+
+    type_name = pyop_var.safe_tp_name()
+    result = _locate_buffer(int(pyop_var.as_address()), type_name)
+    result["scope"] = scope
+    result["type_name"] = type_name
+    return result
+
+
 def acquire_gil(func):  # type: ignore
     def impl(*args):
         # type: (Any) -> Any
         out = _gdb_execute("call (void*) PyGILState_Ensure()")
         gil_state = next((x for x in out.split() if x.startswith("$")), "$1")
-        ret_value = func(*args)
-        _gdb_execute("call (void) PyGILState_Release({})".format(gil_state))
-        return ret_value
+        try:
+            return func(*args)
+        finally:
+            # NOTE: release GIL even if the call was interrupted, otherwise
+            # the process would be deadlocked after detaching
+            _gdb_execute("call (void) PyGILState_Release({})".format(gil_state))
 
     return impl
 
@@ -61,15 +751,23 @@ class FrameWrapper:
         # type: (str) -> None
         self.check_selected()
 
-        py_str = py_str.replace('"', '\\"')
+        py_str = py_str.replace("\\", "\\\\").replace('"', '\\"')
         _gdb_execute('call (void) PyRun_SimpleString("{}")'.format(py_str))
 
-    def run_file(self, file_path):
-        # type: (str) -> None
+    def run_file(self, file_path, params=None):
+        # type: (str, Optional[Dict[str, Any]]) -> None
         if '"' in file_path or "'" in file_path:
             raise RuntimeError("Invalid path")
 
-        command = "with open('{}') as f: exec(f.read())".format(file_path)
+        if params is None:
+            command = "with open('{}') as f: exec(f.read())".format(file_path)
+        else:
+            # NOTE: the script is executed with a copy of globals so that
+            # `__shamiko_params__` doesn't leak into the __main__ module
+            command = (
+                "exec(compile(open('{path}').read(), '{path}', 'exec'), "
+                "dict(globals(), __shamiko_params__={params!r}))"
+            ).format(path=file_path, params=params)
         return self.run_simple_string(command)
 
     def is_evalframe(self):
@@ -140,6 +838,10 @@ class FrameWrapper:
         else:
             return None
 
+    def locate_buffer(self, variable_name):
+        # type: (str) -> Optional[Dict[str, Any]]
+        return _locate_variable_buffer(self._frame, variable_name)
+
 
 class ThreadWrapper:
     def __init__(self, gdb_thread):
@@ -235,7 +937,7 @@ class InferiorWrapper:
     @property
     def threads(self):
         # type: () -> List[ThreadWrapper]
-        return list(six.moves.map(ThreadWrapper, self._inferior.threads()))
+        return [ThreadWrapper(t) for t in self._inferior.threads()]
 
     @property
     def pid(self):
@@ -257,6 +959,10 @@ class InferiorWrapper:
         # type: () -> bool
         return self._inferior.is_valid()
 
+    def read_memory(self, address, length):
+        # type: (int, int) -> memoryview
+        return self._inferior.read_memory(address, length)
+
 
 class GdbWrapper:
     def _key(self):
@@ -265,7 +971,7 @@ class GdbWrapper:
 
     def get_inferior(self):
         # type: () -> List[InferiorWrapper]
-        return list(six.moves.map(InferiorWrapper, gdb.inferiors()))
+        return [InferiorWrapper(i) for i in gdb.inferiors()]
 
     def get_selected_inferior(self):
         # type: () -> InferiorWrapper
@@ -278,3 +984,206 @@ class GdbWrapper:
     def execute(self, cmd):
         # type: (str) -> str
         return _gdb_execute(cmd)
+
+    def attach(self, pid):
+        # type: (int) -> None
+        _gdb_execute("attach {}".format(int(pid)))
+
+    def detach(self):
+        # type: () -> None
+        _gdb_execute("detach")
+
+    def capture_stacks(
+        self,
+        include_native=False,  # type: bool
+        local_frames=0,  # type: int
+        repr_max_len=128,  # type: int
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> List[Dict[str, Any]]
+        spec = _create_frame_filter(frame_filter=frame_filter)
+        result = []
+        selected = gdb.selected_thread()
+        try:
+            threads = sorted(
+                gdb.selected_inferior().threads(), key=lambda t: t.num
+            )
+            gil_holder = _get_gil_holder_lwp(threads)
+            for thread in threads:
+                if not thread.is_valid() or not _match_thread(thread, spec):
+                    continue
+
+                thread.switch()
+                frames, blocking_symbols = _capture_frames(
+                    include_native, local_frames, repr_max_len, spec
+                )
+                if len(frames) == 0 and (
+                    _has_frame_pattern(spec)
+                    or spec.get("frame_index", None) is not None
+                ):
+                    continue
+
+                holds_gil = thread.ptid[1] == gil_holder
+                has_python_frame = any(f["kind"] == "python" for f in frames)
+                result.append(
+                    {
+                        "num": thread.num,
+                        "global_num": thread.global_num,
+                        "ptid": list(thread.ptid),
+                        "name": thread.name,
+                        "is_running": thread.is_running(),
+                        "is_exited": thread.is_exited(),
+                        "is_stopped": thread.is_stopped(),
+                        "holds_gil": holds_gil,
+                        "state": _classify_thread(
+                            blocking_symbols, has_python_frame, holds_gil
+                        ),
+                        "blocked_in": (
+                            blocking_symbols[0] if blocking_symbols else None
+                        ),
+                        "frames": frames,
+                    }
+                )
+        finally:
+            if selected is not None and selected.is_valid():
+                selected.switch()
+
+        return result
+
+    def _run_in_frames(
+        self,
+        func,  # type: Callable[[FrameWrapper], None]
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        result_path,  # type: Optional[str]
+        frame_filter,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> Optional[List[int]]
+        spec = _create_frame_filter(thread_num, frame_index, frame_filter)
+        selected = gdb.selected_thread()
+        try:
+            target = _inject_into_first(_iter_target_frames(spec), func)
+        finally:
+            if selected is not None and selected.is_valid():
+                selected.switch()
+
+        if (
+            target is not None
+            and result_path is not None
+            and not os.path.exists(result_path)
+        ):
+            raise RuntimeError(
+                "The injected code failed before writing its result in "
+                "frame {} of thread {} (see stderr of the process)".format(
+                    target[1], target[0]
+                )
+            )
+
+        return target
+
+    def run_in(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        py_str,  # type: str
+        result_path=None,  # type: Optional[str]
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> Optional[List[int]]
+        return self._run_in_frames(
+            lambda frame: frame.run_simple_string(py_str),
+            thread_num,
+            frame_index,
+            result_path,
+            frame_filter,
+        )
+
+    def run_file_in(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        file_path,  # type: str
+        params=None,  # type: Optional[Dict[str, Any]]
+        result_path=None,  # type: Optional[str]
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> Optional[List[int]]
+        return self._run_in_frames(
+            lambda frame: frame.run_file(file_path, params),
+            thread_num,
+            frame_index,
+            result_path,
+            frame_filter,
+        )
+
+    def run_file_in_threads(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        file_path,  # type: str
+        params=None,  # type: Optional[Dict[str, Any]]
+        result_dirs=None,  # type: Optional[List[str]]
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> List[Dict[str, Any]]
+        # NOTE: unlike run_file_in, the file is injected into every matched
+        # thread. When `result_dirs` ([host, target]) is given, each thread
+        # writes its result to `[num].json` in the directory.
+        spec = _create_frame_filter(thread_num, frame_index, frame_filter)
+        result = []
+        selected = gdb.selected_thread()
+        try:
+            for thread in _iter_target_threads(spec):
+                candidates = [
+                    (thread, frame, index)
+                    for frame, index in _iter_python_frames(spec)
+                ]
+                if len(candidates) == 0:
+                    continue
+
+                thread_params = dict(params or {})
+                if result_dirs is not None:
+                    thread_params["result_path"] = os.path.join(
+                        result_dirs[1], "{}.json".format(thread.num)
+                    )
+
+                target = _inject_into_first(
+                    candidates,
+                    lambda frame: frame.run_file(file_path, thread_params),
+                )
+                result.append(
+                    {
+                        "num": thread.num,
+                        "ptid": list(thread.ptid),
+                        "name": thread.name,
+                        "frame": target[1] if target is not None else None,
+                    }
+                )
+        finally:
+            if selected is not None and selected.is_valid():
+                selected.switch()
+
+        return result
+
+    def locate_buffer(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        variable_name,  # type: str
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> Optional[Dict[str, Any]]
+        spec = _create_frame_filter(thread_num, frame_index, frame_filter)
+        selected = gdb.selected_thread()
+        try:
+            for thread, frame, index in _iter_target_frames(spec):
+                result = _locate_variable_buffer(frame, variable_name)
+                if result is not None:
+                    result["thread"] = thread.num
+                    result["frame"] = index
+                    return result
+        finally:
+            if selected is not None and selected.is_valid():
+                selected.switch()
+
+        return None
@@ -1,5 +1,5 @@
 import os
-from typing import List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from shamiko.simple_rpc.client import RPCClient
 from shamiko.simple_rpc.serializer import SerializationPromise
@@ -10,12 +10,12 @@ class FrameWrapper(SerializationPromise):
         # type: (str) -> None
         return self._call_rpc("run_simple_string", [py_str])
 
-    def run_file(self, file_path):
-        # type: (str) -> None
+    def run_file(self, file_path, params=None):
+        # type: (str, Optional[Dict[str, Any]]) -> None
 
         # NOTE: In order to avoid confusion, we use an absolute path for file_path
         file_path = os.path.abspath(file_path)
-        return self._call_rpc("run_file", [file_path])
+        return self._call_rpc("run_file", [file_path, params])
 
     def is_evalframe(self):
         # type: () -> bool
@@ -71,6 +71,10 @@ class FrameWrapper(SerializationPromise):
             "get_variable_repr", [variable_name, repr_max_len]
         )
 
+    def locate_buffer(self, variable_name):
+        # type: (str) -> Optional[Dict[str, Any]]
+        return self._call_rpc("locate_buffer", [variable_name])
+
 
 class ThreadWrapper(SerializationPromise):
     @property
@@ -153,6 +157,10 @@ class InferiorWrapper(SerializationPromise):
         # type: () -> bool
         return self._call_rpc("is_valid")
 
+    def read_memory(self, address, length):
+        # type: (int, int) -> bytes
+        return self._call_rpc("read_memory", [address, length])
+
 
 class GdbWrapper(SerializationPromise):
     def get_inferior(self):
@@ -171,6 +179,101 @@ class GdbWrapper(SerializationPromise):
         # type: (str) -> str
         return self._call_rpc("execute", [cmd])
 
+    def attach(self, pid):
+        # type: (int) -> None
+        return self._call_rpc("attach", [pid])
+
+    def detach(self):
+        # type: () -> None
+        return self._call_rpc("detach")
+
+    def capture_stacks(
+        self,
+        include_native=False,  # type: bool
+        local_frames=0,  # type: int
+        repr_max_len=128,  # type: int
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> List[Dict[str, Any]]
+        return self._call_rpc(
+            "capture_stacks",
+            [include_native, local_frames, repr_max_len, frame_filter],
+        )
+
+    def run_in(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        py_str,  # type: str
+        result_path=None,  # type: Optional[str]
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> Optional[List[int]]
+        return self._call_rpc(
+            "run_in",
+            [thread_num, frame_index, py_str, result_path, frame_filter],
+        )
+
+    def run_file_in(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        file_path,  # type: str
+        params=None,  # type: Optional[Dict[str, Any]]
+        result_path=None,  # type: Optional[str]
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> Optional[List[int]]
+        # NOTE: In order to avoid confusion, we use an absolute path for file_path
+        file_path = os.path.abspath(file_path)
+        return self._call_rpc(
+            "run_file_in",
+            [
+                thread_num,
+                frame_index,
+                file_path,
+                params,
+                result_path,
+                frame_filter,
+            ],
+        )
+
+    def run_file_in_threads(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        file_path,  # type: str
+        params=None,  # type: Optional[Dict[str, Any]]
+        result_dirs=None,  # type: Optional[List[str]]
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> List[Dict[str, Any]]
+        file_path = os.path.abspath(file_path)
+        return self._call_rpc(
+            "run_file_in_threads",
+            [
+                thread_num,
+                frame_index,
+                file_path,
+                params,
+                result_dirs,
+                frame_filter,
+            ],
+        )
+
+    def locate_buffer(
+        self,
+        thread_num,  # type: Optional[int]
+        frame_index,  # type: Optional[int]
+        variable_name,  # type: str
+        frame_filter=None,  # type: Optional[Dict[str, Any]]
+    ):
+        # type: (...) -> Optional[Dict[str, Any]]
+        return self._call_rpc(
+            "locate_buffer",
+            [thread_num, frame_index, variable_name, frame_filter],
+        )
+
 
 def create_rpc_client(socket_path):
     # type: (str) ->  RPCClient
@@ -0,0 +1,135 @@
+import time
+from typing import Optional
+
+# NOTE: weight of the latest sample in the moving average of pause times
+_SMOOTHING = 0.3
+# NOTE: the depth limit is relaxed when the pause ratio is below this
+# fraction of the budget
+_RELAX_RATIO = 0.5
+# NOTE: a change of the interval smaller than this isn't reported
+_REPORT_THRESHOLD = 0.2
+
+
+class PauseGovernor:
+    # NOTE: each sample stops the process. The governor keeps the ratio of
+    # the time the process is stopped under `budget` (e.g. 0.01 for 1%) by
+    # stretching the interval between samples, and limits the depth of
+    # stacks when the interval reaches `max_interval`.
+    def __init__(
+        self,
+        budget,  # type: float
+        min_interval,  # type: float
+        max_interval=60.0,  # type: float
+        max_depth=None,  # type: Optional[int]
+        min_depth=8,  # type: int
+    ):
+        # type: (...) -> None
+        if not 0.0 < budget < 1.0:
+            raise ValueError("budget must be in (0, 1): {}".format(budget))
+
+        self.budget = budget
+        self._min_interval = min_interval
+        self._max_interval = max(min_interval, max_interval)
+        self._max_depth = max_depth
+        self._min_depth = min_depth
+
+        self._interval = min_interval
+        self._reported_interval = min_interval
+        self._depth = max_depth  # type: Optional[int]
+        self._average_pause = None  # type: Optional[float]
+
+        self._started_at = None  # type: Optional[float]
+        self._total_pause = 0.0
+        self._samples = 0
+
+    @property
+    def interval(self):
+        # type: () -> float
+        return self._interval
+
+    @property
+    def max_depth(self):
+        # type: () -> Optional[int]
+        return self._depth
+
+    @property
+    def average_pause(self):
+        # type: () -> float
+        return self._average_pause or 0.0
+
+    def _get_elapsed(self):
+        # type: () -> float
+        if self._started_at is None:
+            return 0.0
+
+        return time.time() - self._started_at
+
+    @property
+    def pause_ratio(self):
+        # type: () -> float
+        # NOTE: achieved since the first sample
+        elapsed = self._get_elapsed()
+        return self._total_pause / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def expected_pause_ratio(self):
+        # type: () -> float
+        # NOTE: expected by the current interval
+        pause = self.average_pause
+        return pause / (pause + self._interval) if pause > 0 else 0.0
+
+    @property
+    def rate(self):
+        # type: () -> float
+        elapsed = self._get_elapsed()
+        return self._samples / elapsed if elapsed > 0 else 0.0
+
+    def record(self, pause, depth):
+        # type: (float, int) -> bool
+        # NOTE: `depth` is the deepest stack in the sample. Returns True if
+        # the interval or the depth limit is changed notably.
+        if self._started_at is None:
+            self._started_at = time.time() - pause
+        self._total_pause += pause
+        self._samples += 1
+        if self._average_pause is None:
+            self._average_pause = pause
+        else:
+            self._average_pause += _SMOOTHING * (pause - self._average_pause)
+
+        previous_depth = self._depth
+        # NOTE: pause / (pause + interval) <= budget
+        required = self._average_pause * (1.0 - self.budget) / self.budget
+        self._interval = min(
+            max(required, self._min_interval), self._max_interval
+        )
+
+        if required > self._max_interval:
+            # NOTE: shallower stacks take less time to walk
+            limit = depth if self._depth is None else min(self._depth, depth)
+            self._depth = max(self._min_depth, limit // 2)
+        elif self._depth != self._max_depth and (
+            required < self._min_interval * _RELAX_RATIO
+        ):
+            assert self._depth is not None
+            if depth < self._depth:
+                # NOTE: no stack was cut by the limit
+                self._depth = self._max_depth
+            else:
+                self._depth *= 2
+                if self._max_depth is not None:
+                    self._depth = min(self._depth, self._max_depth)
+
+        if (
+            self._depth != previous_depth
+            or abs(self._interval - self._reported_interval)
+            > self._reported_interval * _REPORT_THRESHOLD
+        ):
+            self._reported_interval = self._interval
+            return True
+
+        return False
+
+    def wait(self):
+        # type: () -> None
+        time.sleep(self._interval)
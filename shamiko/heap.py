@@ -0,0 +1,78 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+TypeStat = Tuple[str, int, int]
+
+
+class HeapCensus:
+    def __init__(self, data):
+        # type: (Dict[str, Any]) -> None
+        self._data = data
+
+        # NOTE: different classes can share the same qualified name
+        types = {}  # type: Dict[str, List[int]]
+        for name, count, size in data["types"]:
+            entry = types.setdefault(name, [0, 0])
+            entry[0] += count
+            entry[1] += size
+        self._types = types
+
+    @classmethod
+    def load(cls, path):
+        # type: (str) -> HeapCensus
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        # type: (str) -> None
+        with open(path, "w") as f:
+            json.dump(self._data, f)
+
+    @property
+    def timestamp(self):
+        # type: () -> float
+        return self._data["timestamp"]
+
+    @property
+    def elapsed(self):
+        # type: () -> float
+        return self._data["elapsed"]
+
+    @property
+    def total_objects(self):
+        # type: () -> int
+        return self._data["total_objects"]
+
+    @property
+    def total_size(self):
+        # type: () -> int
+        return self._data["total_size"]
+
+    @property
+    def sampled(self):
+        # type: () -> bool
+        return self._data["sampled"]
+
+    @property
+    def retained(self):
+        # type: () -> List[List[Any]]
+        return self._data["retained"]
+
+    def top_types(self, limit=None):
+        # type: (Optional[int]) -> List[TypeStat]
+        stats = [(name, e[0], e[1]) for name, e in self._types.items()]
+        stats.sort(key=lambda s: s[2], reverse=True)
+        return stats[:limit]
+
+    def diff(self, baseline, limit=None):
+        # type: (HeapCensus, Optional[int]) -> List[TypeStat]
+        stats = []
+        for name in set(self._types.keys()) | set(baseline._types.keys()):
+            count, size = self._types.get(name, [0, 0])
+            base_count, base_size = baseline._types.get(name, [0, 0])
+            if count == base_count and size == base_size:
+                continue
+            stats.append((name, count - base_count, size - base_size))
+
+        stats.sort(key=lambda s: (s[2], s[1]), reverse=True)
+        return stats[:limit]
@@ -0,0 +1,147 @@
+import codecs
+import struct
+import typing
+from typing import Any, BinaryIO, Dict, Optional
+
+if typing.TYPE_CHECKING:
+    from shamiko.gdb_rpc import InferiorWrapper
+
+# NOTE: memory read through gdb is sent by RPC, which encodes it by base64
+GDB_CHUNK_SIZE = 1024 * 1024
+PROC_CHUNK_SIZE = 16 * 1024 * 1024
+
+_NPY_MAGIC = b"\x93NUMPY"
+_NPY_ALIGNMENT = 64
+
+
+class _TextWriter:
+    # NOTE: decodes a string in the encoding of the process incrementally
+    # and writes it by UTF-8
+    def __init__(self, out, encoding):
+        # type: (BinaryIO, str) -> None
+        self._out = out
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+
+    def write(self, data):
+        # type: (Any) -> None
+        self._out.write(self._decoder.decode(data).encode("utf-8"))
+
+    def flush(self):
+        # type: () -> None
+        self._out.write(self._decoder.decode(b"", final=True).encode("utf-8"))
+
+
+def _read_proc_mem(pid, address, length, out):
+    # type: (int, int, int, Any) -> bool
+    # NOTE: returns False without writing anything when the memory can't be
+    # read at all
+    try:
+        f = open("/proc/{}/mem".format(pid), "rb", buffering=0)
+    except (IOError, OSError):
+        return False
+
+    with f:
+        buf = bytearray(min(length, PROC_CHUNK_SIZE))
+        view = memoryview(buf)
+        try:
+            f.seek(address)
+            n = f.readinto(view[: min(length, len(buf))])
+        except (IOError, OSError):
+            return False
+
+        remaining = length
+        while True:
+            if not n:
+                raise IOError(
+                    "Failed to read memory at 0x{:x}".format(
+                        address + length - remaining
+                    )
+                )
+            out.write(view[:n])
+            remaining -= n
+            if remaining <= 0:
+                break
+            n = f.readinto(view[: min(remaining, len(buf))])
+
+    return True
+
+
+def read_memory(inferior, pid, address, length, out, use_proc=True):
+    # type: (InferiorWrapper, int, int, int, Any, bool) -> str
+    # NOTE: /proc/PID/mem is much faster than gdb, but may not be permitted,
+    # e.g. by ptrace_scope of Yama. Returns the method used.
+    if use_proc and length > 0:
+        if _read_proc_mem(pid, address, length, out):
+            return "proc"
+
+    offset = 0
+    while offset < length:
+        size = min(length - offset, GDB_CHUNK_SIZE)
+        out.write(inferior.read_memory(address + offset, size))
+        offset += size
+
+    return "gdb"
+
+
+def write_npy_header(out, dtype, shape, fortran_order):
+    # type: (BinaryIO, str, Any, bool) -> None
+    # NOTE: .npy format version 1.0, which numpy.load can read
+    header = "{{'descr': {!r}, 'fortran_order': {}, 'shape': {!r}, }}".format(
+        dtype, fortran_order, tuple(shape)
+    )
+    prefix_size = len(_NPY_MAGIC) + 2 + 2
+    padding = -(prefix_size + len(header) + 1) % _NPY_ALIGNMENT
+    header = header + " " * padding + "\n"
+    out.write(_NPY_MAGIC + b"\x01\x00")
+    out.write(struct.pack("<H", len(header)))
+    out.write(header.encode("latin-1"))
+
+
+def get_default_format(buffer_info):
+    # type: (Dict[str, Any]) -> str
+    if buffer_info["type"] == "str":
+        return "text"
+    elif buffer_info["type"] == "ndarray":
+        return "npy"
+
+    return "raw"
+
+
+def dump(
+    inferior,  # type: InferiorWrapper
+    pid,  # type: int
+    buffer_info,  # type: Dict[str, Any]
+    out,  # type: BinaryIO
+    output_format=None,  # type: Optional[str]
+    use_proc=True,  # type: bool
+):
+    # type: (...) -> str
+    if output_format is None:
+        output_format = get_default_format(buffer_info)
+
+    writer = out  # type: Any
+    if output_format == "npy":
+        if buffer_info["type"] == "ndarray":
+            dtype = buffer_info["dtype"]
+            shape = buffer_info["shape"]
+            fortran_order = buffer_info["fortran_order"]
+        else:
+            dtype = "|u1"
+            shape = [buffer_info["length"]]
+            fortran_order = False
+        write_npy_header(out, dtype, shape, fortran_order)
+    elif output_format == "text":
+        writer = _TextWriter(out, buffer_info.get("encoding", "utf-8"))
+
+    method = read_memory(
+        inferior,
+        pid,
+        buffer_info["address"],
+        buffer_info["length"],
+        writer,
+        use_proc=use_proc,
+    )
+    if output_format == "text":
+        writer.flush()
+
+    return method
@@ -0,0 +1,272 @@
+import os
+import shutil
+import stat
+import tempfile
+from typing import Any, List, Optional, Tuple
+
+# NOTE: the only place in SharedDirectory where the process can write
+_RESULTS_NAME = "results"
+
+
+def _get_namespace_id(pid, namespace):
+    # type: (int, str) -> Optional[str]
+    try:
+        return os.readlink("/proc/{}/ns/{}".format(pid, namespace))
+    except (IOError, OSError):
+        return None
+
+
+def is_same_namespace(pid, namespace):
+    # type: (int, str) -> bool
+    target = _get_namespace_id(pid, namespace)
+    if target is None:
+        # NOTE: assume the same namespace if we're not allowed to see it
+        return True
+
+    return target == _get_namespace_id(os.getpid(), namespace)
+
+
+def get_root(pid):
+    # type: (int) -> str
+    return "/proc/{}/root".format(pid)
+
+
+def resolve_path(pid, path):
+    # type: (int, str) -> str
+    # NOTE: a path seen from the process, which may live in another mount
+    # namespace, is reachable from here through /proc/PID/root
+    if is_same_namespace(pid, "mnt"):
+        return path
+
+    return os.path.join(get_root(pid), path.lstrip("/"))
+
+
+def _read_status_field(pid, field):
+    # type: (int, str) -> Optional[List[str]]
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == field:
+                    return value.split()
+    except (IOError, OSError):
+        pass  # NOQA
+
+    return None
+
+
+def get_nspids(pid):
+    # type: (int) -> List[int]
+    # NOTE: PIDs of the process in each nested pid namespace, the outermost
+    # (i.e. the one seen from here) first
+    nspids = _read_status_field(pid, "NSpid")
+    if nspids is None:
+        return [pid]
+
+    return [int(p) for p in nspids]
+
+
+def find_host_pid(ns_pid, ns_member_pid):
+    # type: (int, int) -> Optional[int]
+    # NOTE: find the process whose PID is `ns_pid` in the pid namespace where
+    # the process `ns_member_pid` lives
+    pidns = _get_namespace_id(ns_member_pid, "pid")
+    if pidns is None:
+        return None
+
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+
+        pid = int(name)
+        if _get_namespace_id(pid, "pid") != pidns:
+            continue
+        if get_nspids(pid)[-1] == ns_pid:
+            return pid
+
+    return None
+
+
+def get_gdb_commands(pid):
+    # type: (int) -> List[str]
+    if is_same_namespace(pid, "mnt"):
+        return []
+
+    # NOTE: let gdb load shared libraries from the filesystem of the process
+    return ["set sysroot {}".format(get_root(pid))]
+
+
+def get_gdb_options(pid):
+    # type: (int) -> List[str]
+    options = []  # type: List[str]
+    for command in get_gdb_commands(pid):
+        options.extend(["-iex", command])
+
+    return options
+
+
+def get_credentials(pid):
+    # type: (int) -> Optional[Tuple[int, int]]
+    # NOTE: the effective uid and gid of the process
+    uids = _read_status_field(pid, "Uid")
+    gids = _read_status_field(pid, "Gid")
+    if uids is None or gids is None:
+        return None
+
+    return int(uids[1]), int(gids[1])
+
+
+def give_to_process(pid, path):
+    # type: (int, str) -> None
+    # NOTE: let the process, which may run as another user, own a file we
+    # created. Only root can do it, otherwise we are the same user anyway.
+    credentials = get_credentials(pid)
+    if credentials is None or os.geteuid() != 0:
+        return
+
+    # NOTE: never follow a symlink or chown a file someone else planted
+    st = os.lstat(path)
+    if stat.S_ISLNK(st.st_mode) or st.st_uid != os.geteuid():
+        raise RuntimeError("Refused to give {} to the process".format(path))
+
+    os.chown(path, credentials[0], credentials[1], follow_symlinks=False)
+
+
+class SharedDirectory:
+    # NOTE: a temporary directory which both the process and us can access,
+    # even if the process lives in another mount namespace or runs as
+    # another user. `host_path` is the path seen from here and `target_path`
+    # is the one seen from the process.
+    #
+    # The directory itself stays ours, so that nothing can be planted where
+    # we write. The process only reads files staged in it, and writes to the
+    # results subdirectory, which is given to the process.
+    def __init__(self, pid, prefix="shamiko_"):
+        # type: (int, str) -> None
+        self.isolated = not is_same_namespace(pid, "mnt")
+        credentials = get_credentials(pid)
+        self.uid = os.geteuid() if credentials is None else credentials[0]
+        # NOTE: the process can't read our files, e.g. the template cache
+        self.foreign = self.uid != os.geteuid()
+        if not self.isolated:
+            self.host_path = tempfile.mkdtemp(prefix=prefix)
+            self.target_path = self.host_path
+        else:
+            target_tmp = "/tmp"
+            self.host_path = tempfile.mkdtemp(
+                prefix=prefix, dir=resolve_path(pid, target_tmp)
+            )
+            self.target_path = os.path.join(
+                target_tmp, os.path.basename(self.host_path)
+            )
+
+        # NOTE: staged files are readable by the group of the process
+        self._gid = None  # type: Optional[int]
+        try:
+            if self.foreign and credentials is not None and os.geteuid() == 0:
+                self._gid = credentials[1]
+                os.chown(self.host_path, -1, self._gid)
+                os.chmod(self.host_path, 0o750)
+
+            os.mkdir(self.host(_RESULTS_NAME), 0o700)
+            give_to_process(pid, self.host(_RESULTS_NAME))
+        except Exception:
+            self.cleanup()
+            raise
+
+    def host(self, *names):
+        # type: (str) -> str
+        return os.path.join(self.host_path, *names)
+
+    def target(self, *names):
+        # type: (str) -> str
+        return os.path.join(self.target_path, *names)
+
+    def result_host(self, *names):
+        # type: (str) -> str
+        return self.host(_RESULTS_NAME, *names)
+
+    def result_target(self, *names):
+        # type: (str) -> str
+        return self.target(_RESULTS_NAME, *names)
+
+    def put(self, name, data):
+        # type: (str, bytes) -> str
+        # NOTE: write a new file for the process to read. It never follows
+        # or overwrites an existing file.
+        fd = os.open(
+            self.host(name),
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW,
+            0o640,
+        )
+        with os.fdopen(fd, "wb") as f:
+            if self._gid is not None:
+                os.fchown(f.fileno(), -1, self._gid)
+            f.write(data)
+
+        return self.target(name)
+
+    def stage(self, path, name=None):
+        # type: (str, Optional[str]) -> str
+        # NOTE: copy a local file unless the process can read it as is
+        if not self.isolated and not self.foreign:
+            return path
+
+        if name is None:
+            name = os.path.basename(path)
+        with open(path, "rb") as f:
+            return self.put(name, f.read())
+
+    def stat_result(self, name):
+        # type: (str) -> Optional[os.stat_result]
+        # NOTE: a file in the results directory is trusted only if the
+        # process created it, and a symlink never is
+        try:
+            st = os.lstat(self.result_host(name))
+        except FileNotFoundError:
+            return None
+
+        self._check_result(name, st)
+        return st
+
+    def read_result(self, name):
+        # type: (str) -> Optional[str]
+        try:
+            fd = os.open(
+                self.result_host(name),
+                os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK,
+            )
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise RuntimeError(
+                "Refused to read {} of the process: {}".format(name, e)
+            )
+
+        with os.fdopen(fd) as f:
+            st = os.fstat(f.fileno())
+            self._check_result(name, st)
+            if not stat.S_ISREG(st.st_mode):
+                raise RuntimeError(
+                    "Refused to read {} of the process".format(name)
+                )
+
+            return f.read()
+
+    def _check_result(self, name, st):
+        # type: (str, os.stat_result) -> None
+        if stat.S_ISLNK(st.st_mode) or st.st_uid != self.uid:
+            raise RuntimeError("Refused to read {} of the process".format(name))
+
+    def cleanup(self):
+        # type: () -> None
+        # NOTE: rmtree doesn't follow symlinks the process may have created
+        shutil.rmtree(self.host_path, ignore_errors=True)
+
+    def __enter__(self):
+        # type: () -> SharedDirectory
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # type: (Any, Any, Any) -> None
+        self.cleanup()
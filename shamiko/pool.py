@@ -0,0 +1,136 @@
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from typing import List, Optional
+
+import shamiko.session
+import shamiko.symbol_cache
+
+_logger = logging.getLogger(__name__)
+
+
+class GdbWorker:
+    # NOTE: a gdb process which has started the RPC server without any
+    # process, and waits for a session to attach through it
+    def __init__(self, directory):
+        # type: (str) -> None
+        self.directory = directory
+        self.socket_path = os.path.join(directory, "session.sock")
+
+        command = ["gdb", "-q"]
+        for c in shamiko.symbol_cache.get_index_cache_commands():
+            command.extend(["-iex", c])
+        command.extend(shamiko.session.get_server_options(directory))
+
+        os.makedirs(directory, exist_ok=False)
+        self.proc = subprocess.Popen(command, stderr=sys.stderr)
+
+    @property
+    def alive(self):
+        # type: () -> bool
+        return self.proc.poll() is None
+
+    @property
+    def ready(self):
+        # type: () -> bool
+        return self.alive and os.path.exists(self.socket_path)
+
+    def kill(self):
+        # type: () -> None
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class GdbPool:
+    def __init__(self, root_dir, size):
+        # type: (str, int) -> None
+        self._directory = os.path.join(root_dir, "pool")
+        self._size = size
+        self._workers = []  # type: List[GdbWorker]
+        self._counter = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._replenish_requested = threading.Event()
+        self._thread = threading.Thread(target=self._replenish_loop)
+        self._thread.daemon = True
+
+    def start(self):
+        # type: () -> None
+        self._thread.start()
+
+    def _spawn(self):
+        # type: () -> GdbWorker
+        self._counter += 1
+        return GdbWorker(os.path.join(self._directory, str(self._counter)))
+
+    def _replenish_loop(self):
+        # type: () -> None
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+
+                dead = [w for w in self._workers if not w.alive]
+                self._workers = [w for w in self._workers if w.alive]
+                missing = self._size - len(self._workers)
+
+            if len(dead) > 0:
+                # NOTE: gdb would keep failing to start the server, so stop
+                # replenishing and let sessions start their own gdb
+                _logger.warn("Pooled gdb exited unexpectedly")
+                for worker in dead:
+                    worker.kill()
+                return
+
+            for _ in range(missing):
+                try:
+                    worker = self._spawn()
+                except (IOError, OSError) as e:
+                    _logger.warn("Failed to start pooled gdb: %s", e)
+                    return
+
+                with self._lock:
+                    closed = self._closed
+                    if not closed:
+                        self._workers.append(worker)
+
+                if closed:
+                    worker.kill()
+                    return
+
+            self._replenish_requested.wait(1.0)
+            self._replenish_requested.clear()
+
+    def acquire(self):
+        # type: () -> Optional[GdbWorker]
+        # NOTE: returns None if no gdb is ready yet, so that the caller
+        # doesn't wait for the pool
+        worker = None  # type: Optional[GdbWorker]
+        with self._lock:
+            for i, candidate in enumerate(self._workers):
+                if candidate.ready:
+                    worker = self._workers.pop(i)
+                    break
+
+        self._replenish_requested.set()
+        return worker
+
+    def dispose(self):
+        # type: () -> None
+        with self._lock:
+            self._closed = True
+            workers = self._workers
+            self._workers = []
+
+        self._replenish_requested.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        for worker in workers:
+            worker.kill()
@@ -1,11 +1,17 @@
+import errno
 import os
+import typing
 from typing import Optional
 
-import psutil
+if typing.TYPE_CHECKING:
+    import psutil
 
 
 def _get_proc(pid):
     # type: (int) -> Optional[psutil.Process]
+    # NOTE: psutil is imported lazily since it takes a while to load
+    import psutil  # NOQA
+
     try:
         return psutil.Process(pid)
     except psutil.NoSuchProcess:
@@ -14,7 +20,16 @@ def _get_proc(pid):
 
 def pid_exists(pid):
     # type: (int) -> bool
-    return psutil.pid_exists(pid)
+    if pid <= 0:
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # NOTE: EPERM means the process exists but is owned by another user
+        return e.errno == errno.EPERM
+
+    return True
 
 
 def guess_executable(pid):
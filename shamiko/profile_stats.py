@@ -0,0 +1,59 @@
+import pstats
+import typing
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+if typing.TYPE_CHECKING:
+    import cProfile
+
+FuncKey = Tuple[str, int, str]
+
+
+class _RawStats:
+    # NOTE: stats collected in another process. pstats.Stats loads a profile
+    # by calling `create_stats()` and then reading `stats`, which is what
+    # this class provides.
+    def __init__(self, stats):
+        # type: (Dict[FuncKey, Tuple[Any, ...]]) -> None
+        self.stats = stats
+
+    def create_stats(self):
+        # type: () -> None
+        pass  # NOQA
+
+
+def _as_profile(stats):
+    # type: (Dict[FuncKey, Tuple[Any, ...]]) -> cProfile.Profile
+    # NOTE: pstats accepts only a file name or a profile in its signature,
+    # while it uses no other attribute of the profile
+    return typing.cast("cProfile.Profile", _RawStats(stats))
+
+
+def decode(data):
+    # type: (List[List[Any]]) -> Dict[FuncKey, Tuple[Any, ...]]
+    # NOTE: reverses the encoding in cprofile.py.template, where keys of
+    # the dict are converted to lists for JSON
+    stats = {}  # type: Dict[FuncKey, Tuple[Any, ...]]
+    for func, (cc, nc, tt, ct), callers in data:
+        stats[tuple(func)] = (
+            cc,
+            nc,
+            tt,
+            ct,
+            dict((tuple(caller), tuple(v)) for caller, v in callers),
+        )
+    return stats
+
+
+def merge(
+    data_list,  # type: List[List[List[Any]]]
+    stream=None,  # type: Optional[TextIO]
+):
+    # type: (...) -> Optional[pstats.Stats]
+    result = None  # type: Optional[pstats.Stats]
+    for data in data_list:
+        profile = _as_profile(decode(data))
+        if result is None:
+            result = pstats.Stats(profile, stream=stream)
+        else:
+            result.add(profile)
+    return result
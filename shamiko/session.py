@@ -3,31 +3,88 @@ from __future__ import absolute_import
 import logging
 import os
 import shutil
+import signal
 import subprocess
 import sys
 import threading
 import time
 import typing
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 import shamiko
+import shamiko.cache
 import shamiko.gdb_rpc
+import shamiko.namespaces
+import shamiko.symbol_cache
 
 if typing.TYPE_CHECKING:
+    import shamiko.pool
     import shamiko.simple_rpc.client
 
 _logger = logging.getLogger(__name__)
 
 
+def get_server_options(session_directory, commands=None):
+    # type: (str, Optional[List[str]]) -> List[str]
+    # NOTE: `commands` are executed after the python environment is set up
+    # and before the server starts
+    package_dir_parent = os.path.dirname(shamiko._get_package_root())
+    options = [
+        "-batch",
+        "-ex",
+        "set trace-commands on",
+        # NOTE: a function call in the process interrupted by a deadline is
+        # unwound instead of being left in the middle
+        "-ex",
+        "set unwindonsignal on",
+        "-ex",
+        "py sys.path.append('{}')".format(package_dir_parent),
+        # NOTE: let gdb's python keep byte-compiled shamiko modules in the
+        # per-user cache since the package directory may be read-only
+        "-ex",
+        "py sys.pycache_prefix = {!r}".format(
+            shamiko.cache.get_cache_dir("pycache")
+        ),
+    ]
+    for command in commands or []:
+        options.extend(["-ex", command])
+    options.extend(
+        [
+            "-ex",
+            "py import shamiko.gdb.bootstrap; "
+            "shamiko.gdb.bootstrap.main({!r})".format(session_directory),
+        ]
+    )
+    return options
+
+
 class Session:
-    def __init__(self, root_dir, pid, executable, context_directory):
-        # type: (str, int, str, str) -> None
+    def __init__(
+        self,
+        root_dir,  # type: str
+        pid,  # type: int
+        executable,  # type: str
+        context_directory,  # type: str
+        core_file=None,  # type: Optional[str]
+        worker=None,  # type: Optional[shamiko.pool.GdbWorker]
+    ):
+        # type: (...) -> None
         self._pid = pid
         self._executable = executable
+        # NOTE: when a core file is given, the session reads it instead of
+        # attaching to the process
+        self._core_file = core_file
+
+        # NOTE: a pooled gdb which is waiting for attaching, if given
+        self._worker = worker
 
         self._context_directory = os.path.abspath(context_directory)
-        self._session_directory = os.path.join(root_dir, "sessions", str(pid))
-        self._bootstrap_path = os.path.join(self._session_directory, "run.py")
+        if worker is None:
+            self._session_directory = os.path.join(
+                root_dir, "sessions", str(pid)
+            )
+        else:
+            self._session_directory = worker.directory
         self._socket_path = os.path.join(
             self._session_directory, "session.sock"
         )
@@ -43,10 +100,6 @@ class Session:
     def _initialize_session_dir(self):
         # type: () -> None
         os.makedirs(self._session_directory, exist_ok=False)
-        shutil.copyfile(
-            os.path.join(shamiko._get_template_dir(), "bootstrap.py.template"),
-            self._bootstrap_path,
-        )
 
     def _remove_session_dir(self):
         # type: () -> None
@@ -72,28 +125,68 @@ class Session:
 
         return True
 
+    def _get_setup_commands(self):
+        # type: () -> List[str]
+        commands = ["set directories {}".format(self._context_directory)]
+        helper_loader = shamiko.symbol_cache.get_helper_loader(self._executable)
+        if helper_loader is not None:
+            commands.append(helper_loader)
+
+        return commands
+
+    def _get_command(self):
+        # type: () -> List[str]
+        live_pid = self._pid if self._core_file is None else None
+        command = ["gdb", "-q"]
+        if live_pid is not None:
+            command.extend(shamiko.namespaces.get_gdb_options(live_pid))
+        command.extend(
+            shamiko.symbol_cache.get_gdb_options(self._executable, live_pid)
+        )
+        command.append(self._executable)
+        if self._core_file is not None:
+            command.extend(["-c", self._core_file])
+        else:
+            command.extend(["-p", str(self._pid)])
+        command.extend(
+            get_server_options(
+                self._session_directory, self._get_setup_commands()
+            )
+        )
+        return command
+
+    def _attach_worker(self):
+        # type: () -> bool
+        # NOTE: a pooled gdb has already started the server, so the options
+        # which would be given by the command line are executed through it
+        commands = shamiko.namespaces.get_gdb_commands(self._pid)
+        commands.extend(
+            shamiko.symbol_cache.get_helper_commands(
+                self._executable, self._pid
+            )
+        )
+        commands.append("file {}".format(self._executable))
+        commands.append("attach {}".format(self._pid))
+        commands.extend(self._get_setup_commands())
+        try:
+            for command in commands:
+                self.session.execute(command)
+        except Exception as e:
+            _logger.warn("Failed to attach by pooled gdb: %s", e)
+            return False
+
+        return True
+
     def _gdb_loop(self):
         # type: () -> None
-        package_dir_parent = os.path.dirname(shamiko._get_package_root())
-        command = [
-            "gdb",
-            "-q",
-            self._executable,
-            "-p",
-            str(self._pid),
-            "-batch",
-            "-ex",
-            "set trace-commands on",
-            "-ex",
-            "set directories {}".format(self._context_directory),
-            "-ex",
-            "py sys.path.append('{}')".format(package_dir_parent),
-            "-x",
-            self._bootstrap_path,
-        ]
         try:
-            self._initialize_session_dir()
-            proc = subprocess.Popen(command, stderr=sys.stderr)
+            if self._worker is None:
+                # NOTE: the command is built in the try block, so that the
+                # session is released when reading the executable fails
+                self._initialize_session_dir()
+                proc = subprocess.Popen(self._get_command(), stderr=sys.stderr)
+            else:
+                proc = self._worker.proc
 
             try:
                 if not self._wait_for_socket():
@@ -103,14 +196,27 @@ class Session:
                     self._socket_path
                 )
                 try:
+                    if self._worker is not None and not self._attach_worker():
+                        return
+
                     self._available.set()
                     while (
                         proc.poll() is None
                         and not self._terminate_requested.is_set()
+                        and not self._client.closed
                     ):
                         time.sleep(0.1)
 
-                    if self._terminate_requested.is_set():
+                    if self._client.closed:
+                        # NOTE: the connection was given up by a timeout.
+                        # The server exits by itself after the interrupted
+                        # call returns, otherwise gdb is killed below.
+                        _logger.warn("Connection to the server was lost")
+                        try:
+                            proc.wait(10.0)
+                        except subprocess.TimeoutExpired:
+                            pass  # NOQA
+                    elif self._terminate_requested.is_set():
                         _logger.info("Sending terminate server request")
                         self._client.terminate_server()
                         try:
@@ -125,12 +231,26 @@ class Session:
                 if proc.poll() is None:
                     _logger.warn("killing process")
                     proc.kill()
+                    proc.wait()
+                    self._resume_process()
         finally:
             self._client = None
             self._gdb_thread = None
             self._available.set()
             self._remove_session_dir()
 
+    def _resume_process(self):
+        # type: () -> None
+        # NOTE: threads are detached by the kernel when gdb is killed, but
+        # the process may remain in the stopped state
+        if self._core_file is not None:
+            return
+
+        try:
+            os.kill(self._pid, signal.SIGCONT)
+        except OSError:
+            pass  # NOQA
+
     def start(self):
         # type: () -> None
         with self._lock:
@@ -178,3 +298,13 @@ class Session:
             )
 
         return entry_point
+
+    def set_deadline(self, deadline):
+        # type: (Optional[float]) -> None
+        # NOTE: RPC calls after `deadline` (time.time()) are rejected, and
+        # a call in progress is interrupted at `deadline`
+        with self._lock:
+            if self._client is None:
+                raise RuntimeError("Session not started")
+
+            self._client.deadline = deadline
@@ -1,83 +1,187 @@
 import contextlib
-from typing import Callable, Iterator, Optional
-
-from shamiko.app import Shamiko
-from shamiko.gdb_rpc import FrameWrapper, InferiorWrapper, ThreadWrapper
-from shamiko.session import Session
-
-
-def visit(
-    inferior,  # type: InferiorWrapper
-    visit_thread,  # type: Callable[[ThreadWrapper], bool]
-    visit_frame,  # type: Callable[[FrameWrapper], bool]
-    frame_predicate,  # type: Callable[[FrameWrapper], bool]
+import json
+import os
+import time
+import typing
+from typing import Any, Dict, Iterator, List, Optional
+
+import shamiko
+import shamiko.cache
+import shamiko.namespaces
+
+if typing.TYPE_CHECKING:
+    from shamiko.gdb_rpc import GdbWrapper
+    from shamiko.session import Session
+
+
+# NOTE: keys of `KEY=PATTERN` expressions and keys of a frame filter, which
+# is evaluated by GdbWrapper in gdb instead of visiting frames from here
+_MATCH_KEYS = {
+    "thread": "thread_name",
+    "file": "filename",
+    "function": "function",
+    "depth": "max_depth",
+}
+
+
+def create_frame_filter(
+    thread_num=None,  # type: Optional[int]
+    frame_index=None,  # type: Optional[int]
+    match=None,  # type: Optional[List[str]]
 ):
-    # type: (...) -> bool
-    for thread in inferior.threads:
-        if not visit_thread(thread):
-            continue
+    # type: (...) -> Optional[Dict[str, Any]]
+    spec = {}  # type: Dict[str, Any]
+    if thread_num is not None:
+        spec["thread_num"] = thread_num
+    if frame_index is not None:
+        spec["frame_index"] = frame_index
 
-        thread.switch()
+    for expression in match or []:
+        key, sep, pattern = expression.partition("=")
+        if not sep or key not in _MATCH_KEYS:
+            raise ValueError(
+                "Invalid match: {} (expected KEY=PATTERN where KEY is one of "
+                "{})".format(expression, ", ".join(sorted(_MATCH_KEYS)))
+            )
 
-        for frame in thread.get_python_frames():
-            if not visit_frame(frame):
-                continue
-
-            if frame_predicate(frame):
-                return True
+        name = _MATCH_KEYS[key]
+        spec[name] = int(pattern) if name == "max_depth" else pattern
 
-    return False
+    return spec if len(spec) > 0 else None
 
 
-def traverse_frame(
-    inferior,  # type: InferiorWrapper
-    predicate,  # type: Callable[[FrameWrapper], bool]
-    thread_id=None,  # type: Optional[int]
-    frame_idx=None,  # type: Optional[int]
+@contextlib.contextmanager
+def create_session(
+    pid,  # type: int
+    executable=None,  # type: Optional[str]
+    context_dir=None,  # type: Optional[str]
+    timeout=None,  # type: Optional[float]
+    core_file=None,  # type: Optional[str]
 ):
-    # type: (...) -> bool
+    # type: (...) -> Iterator[Session]
+    from shamiko.app import Shamiko
 
-    def default_thread(_):
-        # type: (ThreadWrapper) -> bool
-        return True
+    with Shamiko() as smk:
+        session = smk.attach(pid, executable, context_dir, core_file)
+        with session as s:
+            if timeout is not None:
+                s.set_deadline(time.time() + timeout)
+            yield s
 
-    if thread_id is not None:
 
-        def thread_pred(thread):
-            # type: (ThreadWrapper) -> bool
-            tid = thread.num
-            return tid == thread_id
+def render_template(template_name, **kwargs):
+    # type: (str, Any) -> str
+    import jinja2
 
-    else:
+    env = jinja2.Environment(
+        autoescape=False,
+        loader=jinja2.FileSystemLoader(shamiko._get_template_dir()),
+    )
+    template = env.get_template(template_name)
+    return template.render(**kwargs)
 
-        def thread_pred(thread):
-            # type: (ThreadWrapper) -> bool
-            return True
 
-    visit_thread = thread_pred
+def _get_templates_stamp():
+    # type: () -> int
+    # NOTE: templates don't change in an installed package, but they do in
+    # a development checkout
+    return max(
+        entry.stat().st_mtime_ns
+        for entry in os.scandir(shamiko._get_template_dir())
+    )
 
-    if frame_idx is not None:
 
-        def frame_pred(frame):
-            # type: (FrameWrapper) -> bool
-            idx = frame.get_index()
-            return idx == frame_idx
+def get_template_script(template_name):
+    # type: (str) -> str
+    # NOTE: templates take parameters at runtime by `__shamiko_params__`,
+    # so that a rendered script is cached and reused across sessions
+    name, _ = os.path.splitext(template_name)
+    root, ext = os.path.splitext(name)
+    script_path = os.path.join(
+        shamiko.cache.get_cache_dir("templates"),
+        "{}.{:x}{}".format(root, _get_templates_stamp(), ext),
+    )
+    if not os.path.exists(script_path):
+        shamiko.cache.write_atomic(script_path, render_template(template_name))
 
-    else:
+    return script_path
 
-        def frame_pred(frame):
-            # type: (FrameWrapper) -> bool
-            return True
 
-    visit_frame = frame_pred
+_NO_RESULT_MESSAGE = (
+    "The injected code failed before writing its result "
+    "(see stderr of the process)"
+)
 
-    return visit(inferior, visit_thread, visit_frame, predicate)
 
+def run_template(
+    session,  # type: GdbWrapper
+    template_name,  # type: str
+    thread_id=None,  # type: Optional[int]
+    frame_idx=None,  # type: Optional[int]
+    **kwargs  # type: Any
+):
+    # type: (...) -> Optional[Any]
+    # NOTE: the template is expected to include `_result_writer.py.template`,
+    # which writes a return value of the injected code to `result_path`
+    pid = session.get_selected_inferior().pid
+    with shamiko.namespaces.SharedDirectory(pid, "shamiko_inj_") as shared:
+        script_path = shared.stage(get_template_script(template_name))
+        result_path = shared.result_host("result.json")
+        params = dict(kwargs, result_path=shared.result_target("result.json"))
+
+        target = session.run_file_in(
+            thread_id, frame_idx, script_path, params, result_path
+        )
+        if target is None:
+            return None
+
+        content = shared.read_result("result.json")
+
+    if content is None:
+        raise RuntimeError(_NO_RESULT_MESSAGE)
+
+    payload = json.loads(content)
+    if "error" in payload:
+        raise RuntimeError(
+            "An exception occured in the injected code:\n" + payload["error"]
+        )
+
+    return payload["result"]
+
+
+def run_template_in_threads(
+    session,  # type: GdbWrapper
+    template_name,  # type: str
+    params,  # type: Dict[str, Any]
+    frame_filter=None,  # type: Optional[Dict[str, Any]]
+):
+    # type: (...) -> List[Dict[str, Any]]
+    # NOTE: like run_template, but the template is run in every thread
+    # matched by `frame_filter`. Each thread in the result has either
+    # "result" or "error". Parameters of the template are given as a dict,
+    # so that their names never collide with arguments of this function.
+    pid = session.get_selected_inferior().pid
+    with shamiko.namespaces.SharedDirectory(pid, "shamiko_inj_") as shared:
+        script_path = shared.stage(get_template_script(template_name))
+        targets = session.run_file_in_threads(
+            None,
+            None,
+            script_path,
+            params,
+            [shared.result_host(), shared.result_target()],
+            frame_filter,
+        )
+
+        for target in targets:
+            if target["frame"] is None:
+                target["error"] = "Couldn't run in any frame of the thread"
+                continue
 
-@contextlib.contextmanager
-def create_session(pid, executable=None, context_dir=None):
-    # type: (int, Optional[str], Optional[str]) -> Iterator[Session]
-    with Shamiko() as smk:
-        session = smk.attach(pid, executable, context_dir)
-        with session as s:
-            yield s
+            content = shared.read_result("{}.json".format(target["num"]))
+            if content is None:
+                target["error"] = _NO_RESULT_MESSAGE
+                continue
+
+            target.update(json.loads(content))
+
+    return targets
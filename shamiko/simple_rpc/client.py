@@ -2,12 +2,21 @@ import json
 import logging
 import socket
 import threading
-from typing import Any, List, Optional
+import time
+from typing import Any, Dict, List, Optional
 
-from shamiko.simple_rpc import serializer, reader
+from . import reader, serializer
 
 _logger = logging.getLogger(__name__)
 
+# NOTE: the server is given this period after a deadline to abort the call
+# and respond, before the client gives up the connection
+DEADLINE_GRACE = 5.0
+
+
+class RPCTimeoutError(RuntimeError):
+    pass
+
 
 class SocketClient:
     def __init__(self, socket_path):
@@ -22,19 +31,42 @@ class SocketClient:
         self._closed.set()
         self._socket.close()
 
-    def communicate(self, request, noresponse=False):
-        # type: (str, bool) -> Optional[str]
+    @property
+    def closed(self):
+        # type: () -> bool
+        return self._closed.is_set()
+
+    def communicate(self, request, noresponse=False, timeout=None):
+        # type: (str, bool, Optional[float]) -> Optional[str]
         if self._closed.is_set():
             raise RuntimeError("Already closed")
 
         request = request.rstrip("\n")
         request = "{}\n".format(request)
-        self._socket.send(request.encode("utf-8"))
+        self._socket.settimeout(None)
+        self._socket.sendall(request.encode("utf-8"))
         if noresponse:
             return None
 
+        deadline = time.time() + timeout if timeout is not None else None
         while True:
-            data = self._socket.recv(4096).decode("utf-8")
+            if deadline is not None:
+                self._socket.settimeout(max(deadline - time.time(), 0.0))
+            try:
+                chunk = self._socket.recv(4096)
+            except socket.timeout:
+                # NOTE: a late response can't be told from the next one,
+                # so that the connection is no longer usable
+                self.close()
+                assert timeout is not None
+                raise RPCTimeoutError(
+                    "No response from the server in {:.1f}s".format(timeout)
+                )
+            if not chunk:
+                self.close()
+                raise RuntimeError("Connection closed by the server")
+
+            data = chunk.decode("utf-8")
             _logger.debug("Response: %s", data)
             self._reader.write(data)
             response = self._reader.readlines()
@@ -44,11 +76,28 @@ class SocketClient:
 
 
 class RPCClient(SocketClient):
-    def __init__(self, socket_path):
-        # type: (str) -> None
+    def __init__(self, socket_path, timeout=None, intern_strings=True):
+        # type: (str, Optional[float], bool) -> None
         super(RPCClient, self).__init__(socket_path)
 
         self._session = serializer.SerializeSession(self)
+        # NOTE: let the server send repeated strings by index. A server
+        # which doesn't know it ignores the flag.
+        self._intern_strings = intern_strings
+        # NOTE: a call is aborted when it exceeds `timeout` seconds or the
+        # absolute `deadline` (time.time()), whichever comes first
+        self.timeout = timeout
+        self.deadline = None  # type: Optional[float]
+
+    def _get_deadline(self):
+        # type: () -> Optional[float]
+        deadlines = []
+        if self.timeout is not None:
+            deadlines.append(time.time() + self.timeout)
+        if self.deadline is not None:
+            deadlines.append(self.deadline)
+
+        return min(deadlines) if len(deadlines) > 0 else None
 
     def terminate_server(self):
         # type: () -> None
@@ -83,14 +132,28 @@ class RPCClient(SocketClient):
             "m": class_name,
             "f": func_name,
             "a": arg_serialized,
-        }
+        }  # type: Dict[str, Any]
+        if self._intern_strings:
+            body["n"] = 1
         if instance_id is not None:
             # check if instance is exists
             self._session.get(class_name, instance_id, create_promise=False)
             body["i"] = instance_id
 
+        deadline = self._get_deadline()
+        timeout = None
+        if deadline is not None:
+            if time.time() >= deadline:
+                raise RPCTimeoutError(
+                    "Deadline exceeded before calling {}.{}".format(
+                        class_name, func_name
+                    )
+                )
+            body["d"] = deadline
+            timeout = deadline - time.time() + DEADLINE_GRACE
+
         request = json.dumps(body)
-        response = self.communicate(request)
+        response = self.communicate(request, timeout=timeout)
         if response is None:
             raise RuntimeError("RPCCall failed")
 
@@ -105,6 +168,11 @@ class RPCClient(SocketClient):
                 + "Exception class: {}\n".format(response_dict["c"])
                 + "Exception message: {}\n".format(response_dict["r"])
             )
+        elif response_dict["s"] == "deadline":
+            raise RPCTimeoutError(
+                "Deadline exceeded in remote server:\n"
+                + "message: {}\n".format(response_dict["r"])
+            )
         elif response_dict["s"] == "rpc-error":
             raise RuntimeError(
                 "An RPC exception occured:\n"
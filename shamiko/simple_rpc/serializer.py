@@ -1,7 +1,12 @@
+import base64
 import collections
+import sys
+import typing
 from typing import Any, DefaultDict, Dict, List, Optional, Type
 
-from shamiko.simple_rpc import client
+# NOTE: serializer is loaded by the gdb side, which doesn't need the client
+if typing.TYPE_CHECKING:
+    from . import client
 
 
 class SerializationPromise(object):
@@ -24,6 +29,15 @@ class SerializationPromise(object):
         )
 
 
+# NOTE: strings which repeat in responses (e.g. filenames, function names
+# and keys of dicts) are sent once per connection, and referred by index
+# afterwards. Short strings aren't worth it, and long strings are rarely
+# repeated.
+_INTERN_MIN_LENGTH = 4
+_INTERN_MAX_LENGTH = 512
+_INTERN_MAX_ENTRIES = 65536
+
+
 class SerializeSession:
     def __init__(self, rpc_client=None):
         # type: (Optional[client.RPCClient]) -> None
@@ -35,6 +49,11 @@ class SerializeSession:
         )  # type: Dict[str, Type[SerializationPromise]]  # NOQA
         self._rpc_client = rpc_client
 
+        # NOTE: enabled by the server only when the client accepts it
+        self.intern_strings = False
+        self._string_ids = {}  # type: Dict[str, int]
+        self._strings = []  # type: List[str]
+
     def register_promise_class(self, klass):
         # type: (Type[SerializationPromise]) -> None
         self._promise_class_table[klass.__name__] = klass
@@ -63,6 +82,45 @@ class SerializeSession:
 
         return d[instance_id]
 
+    def reset_strings(self):
+        # type: () -> None
+        self._string_ids.clear()
+        del self._strings[:]
+
+    def intern(self, value):
+        # type: (str) -> Optional[Dict[str, Any]]
+        if not _INTERN_MIN_LENGTH <= len(value) <= _INTERN_MAX_LENGTH:
+            return None
+
+        index = self._string_ids.get(value, None)
+        if index is not None:
+            return _create_entry("istr", index)
+
+        if len(self._string_ids) >= _INTERN_MAX_ENTRIES:
+            return None
+
+        index = len(self._string_ids)
+        self._string_ids[value] = index
+        # NOTE: the first occurrence carries the string itself
+        entry = _create_entry("istr", index)
+        entry["s"] = value
+        return entry
+
+    def put_string(self, index, value):
+        # type: (int, str) -> None
+        # NOTE: a definition may overwrite an index when the server reset
+        # its table
+        value = sys.intern(value)
+        if index < len(self._strings):
+            self._strings[index] = value
+        else:
+            self._strings.extend([""] * (index - len(self._strings)))
+            self._strings.append(value)
+
+    def get_string(self, index):
+        # type: (int) -> str
+        return self._strings[index]
+
 
 def deserialize(session, object_json, create_promise=False):
     # type: (SerializeSession, Dict[str, Any], bool) -> Any
@@ -79,6 +137,14 @@ def deserialize(session, object_json, create_promise=False):
     elif otype == "str":
         assert isinstance(value, str)
         return value
+    elif otype == "istr":
+        assert isinstance(value, int)
+        if "s" in object_json:
+            session.put_string(value, object_json["s"])
+        return session.get_string(value)
+    elif otype == "bytes":
+        assert isinstance(value, str)
+        return base64.b64decode(value)
     elif otype == "list":
         assert isinstance(value, list)
         result = []
@@ -87,13 +153,13 @@ def deserialize(session, object_json, create_promise=False):
         return result
     elif otype == "dict":
         assert isinstance(value, list)
-        result = []
+        result_dict = {}
         for element in value:
             assert len(element) == 2
             e_key = deserialize(session, element[0], create_promise)
             e_value = deserialize(session, element[1], create_promise)
-            result[e_key] = e_value
-        return result
+            result_dict[e_key] = e_value
+        return result_dict
     elif otype == "class":
         class_name = object_json["c"]
         return session.get(class_name, value, create_promise)
@@ -119,7 +185,14 @@ def serialize(session, obj):
     elif isinstance(obj, float):
         return _create_entry("float", obj)
     elif isinstance(obj, str):
+        if session.intern_strings:
+            entry = session.intern(obj)
+            if entry is not None:
+                return entry
         return _create_entry("str", obj)
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        # NOTE: memoryview (e.g. memory read by gdb) is encoded without copy
+        return _create_entry("bytes", base64.b64encode(obj).decode("ascii"))
     elif isinstance(obj, list) or isinstance(obj, tuple):
         return _create_entry("list", [serialize(session, e) for e in obj])
     elif isinstance(obj, dict):
@@ -3,9 +3,10 @@ import logging
 import os
 import socket
 import threading
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Callable, Dict, Optional
 
-from shamiko.simple_rpc import reader, serializer
+from . import reader, serializer
 
 _logger = logging.getLogger(__name__)
 
@@ -59,21 +60,37 @@ class SocketServer:
 
 
 class RPCServer(SocketServer):
-    def __init__(self, socket_path):
-        # type: (str) -> None
+    def __init__(
+        self,
+        socket_path,  # type: str
+        interrupt=None,  # type: Optional[Callable[[], None]]
+        terminate_on_disconnect=False,  # type: bool
+    ):
+        # type: (...) -> None
         super(RPCServer, self).__init__(socket_path)
 
         self._session = serializer.SerializeSession()
         self._dispatch_table = {}  # type: Dict[str, type]
         self._reader = reader.BufferedReader()
+        # NOTE: `interrupt` is called from another thread when a call exceeds
+        # its deadline. It is expected to make the call raise an exception.
+        self._interrupt = interrupt
+        self._interrupt_lock = threading.Lock()
+        self._calling = False
+        self._terminate_on_disconnect = terminate_on_disconnect
 
     def _handle_connection(self, connection, addr):
         # type: (socket.socket, Any) -> None
+        # NOTE: interned strings are valid only in a connection
+        self._session.reset_strings()
         while not self._terminate_request.is_set():
             line = connection.recv(4096).decode("utf-8")
             if not line:
                 # connection was closed
                 self._reader.clear()
+                if self._terminate_on_disconnect:
+                    _logger.info("connection closed. terminating")
+                    self.terminate()
                 return
 
             self._reader.write(line)
@@ -82,10 +99,14 @@ class RPCServer(SocketServer):
             for request in requests:
                 try:
                     _logger.debug("Received: {}".format(request))
-                    resp = self._dispatch(line)
+                    resp = self._dispatch(request)
                     if resp is not None:
                         resp = "{}\n".format(resp.rstrip("\n"))
                         connection.send(resp.encode("utf-8"))
+                except KeyboardInterrupt:
+                    # NOTE: an interrupt can be delivered just after the call
+                    _logger.warn("Interrupted out of a call")
+                    continue  # NOQA
                 except Exception as e:
                     _logger.warn("An unhandled exception occured: {}".format(e))
                     continue  # NOQA
@@ -104,17 +125,24 @@ class RPCServer(SocketServer):
 
     def _create_response(self, ret_value):
         # type: (Any) -> str
-        return json.dumps(
-            {
-                "s": "response",
-                "r": serializer.serialize(self._session, ret_value),
-            }
-        )
+        try:
+            serialized = serializer.serialize(self._session, ret_value)
+        except Exception:
+            # NOTE: strings defined in the response which is never sent are
+            # unknown to the client, so that they have to be defined again
+            self._session.reset_strings()
+            raise
+
+        return json.dumps({"s": "response", "r": serialized})
 
     def _create_rpc_error(self, ret_msg):
         # type: (str) -> str
         return json.dumps({"s": "rpc-error", "r": ret_msg})
 
+    def _create_deadline_error(self, ret_msg):
+        # type: (str) -> str
+        return json.dumps({"s": "deadline", "r": ret_msg})
+
     def _create_exception(self, exception):
         # type: (Exception) -> str
         return json.dumps(
@@ -181,12 +209,55 @@ class RPCServer(SocketServer):
 
             args = [instance] + args
 
+        self._session.intern_strings = bool(request.get("n", False))
+
+        deadline = request.get("d", None)
+        if deadline is not None and time.time() >= deadline:
+            return self._create_deadline_error(
+                "deadline exceeded before calling {}".format(func_name)
+            )
+
+        timer = None
+        if deadline is not None and self._interrupt is not None:
+            timer = threading.Timer(
+                deadline - time.time(), self._interrupt_call
+            )
+            timer.daemon = True
+
         try:
+            with self._interrupt_lock:
+                self._calling = True
+            if timer is not None:
+                timer.start()
+
             if isinstance(func, property):
                 ret_value = func.fget(*args)
             else:
                 ret_value = func(*args)
+        except KeyboardInterrupt:
+            return self._create_deadline_error(
+                "{} was interrupted".format(func_name)
+            )
         except Exception as e:
+            if deadline is not None and time.time() >= deadline:
+                return self._create_deadline_error(
+                    "{} was aborted: {}".format(func_name, e)
+                )
             return self._create_exception(e)
+        finally:
+            with self._interrupt_lock:
+                self._calling = False
+            if timer is not None:
+                timer.cancel()
 
         return self._create_response(ret_value)
+
+    def _interrupt_call(self):
+        # type: () -> None
+        with self._interrupt_lock:
+            if not self._calling:
+                return
+
+            _logger.warn("deadline exceeded. interrupting the call")
+            assert self._interrupt is not None
+            self._interrupt()
@@ -0,0 +1,143 @@
+import json
+import socket
+import time
+import zipfile
+from typing import Any, Dict, List, Optional
+
+from shamiko.version import __version__
+
+# NOTE: a snapshot is a zip archive which has `meta.json` (process metadata
+# and an index of threads) and a member per thread, so that a thread is
+# loaded only when it is viewed
+FORMAT_VERSION = 1
+_META_NAME = "meta.json"
+_THREAD_NAME = "threads/{}.json"
+
+
+def _dumps(obj):
+    # type: (Any) -> bytes
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _summarize_frame(frame):
+    # type: (Optional[Dict[str, Any]]) -> Optional[str]
+    if frame is None:
+        return None
+    if frame["filename"] is not None:
+        return "{}:{} in {}".format(
+            frame["filename"], frame["line"], frame["function"]
+        )
+
+    return frame["description"] or frame["function"]
+
+
+def save(
+    path,  # type: str
+    process,  # type: Dict[str, Any]
+    stacks,  # type: List[Dict[str, Any]]
+    options,  # type: Dict[str, Any]
+    elapsed,  # type: float
+):
+    # type: (...) -> None
+    index = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, stack in enumerate(stacks):
+            name = _THREAD_NAME.format(i)
+            archive.writestr(name, _dumps(stack))
+            top = next(
+                (f for f in stack["frames"] if f["kind"] == "python"), None
+            )
+            index.append(
+                {
+                    "member": name,
+                    "num": stack["num"],
+                    "lwp": stack["ptid"][1],
+                    "name": stack["name"],
+                    "state": stack["state"],
+                    "holds_gil": stack["holds_gil"],
+                    "blocked_in": stack["blocked_in"],
+                    "frames": len(stack["frames"]),
+                    "top": _summarize_frame(top),
+                }
+            )
+
+        meta = {
+            "version": FORMAT_VERSION,
+            "shamiko_version": __version__,
+            "timestamp": time.time(),
+            "hostname": socket.gethostname(),
+            "elapsed": elapsed,
+            "process": process,
+            "options": options,
+            "threads": index,
+        }
+        archive.writestr(_META_NAME, _dumps(meta))
+
+
+class StackSnapshot:
+    def __init__(self, path):
+        # type: (str) -> None
+        self._archive = zipfile.ZipFile(path, "r")
+        meta = json.loads(self._archive.read(_META_NAME).decode("utf-8"))
+        if meta.get("version", None) != FORMAT_VERSION:
+            self._archive.close()
+            raise RuntimeError(
+                "Unsupported snapshot version: {}".format(meta.get("version"))
+            )
+        self._meta = meta
+
+    @classmethod
+    def load(cls, path):
+        # type: (str) -> StackSnapshot
+        return cls(path)
+
+    def close(self):
+        # type: () -> None
+        self._archive.close()
+
+    def __enter__(self):
+        # type: () -> StackSnapshot
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # type: (Any, Any, Any) -> None
+        self.close()
+
+    @property
+    def timestamp(self):
+        # type: () -> float
+        return self._meta["timestamp"]
+
+    @property
+    def hostname(self):
+        # type: () -> str
+        return self._meta["hostname"]
+
+    @property
+    def elapsed(self):
+        # type: () -> float
+        return self._meta["elapsed"]
+
+    @property
+    def process(self):
+        # type: () -> Dict[str, Any]
+        return self._meta["process"]
+
+    @property
+    def options(self):
+        # type: () -> Dict[str, Any]
+        return self._meta["options"]
+
+    @property
+    def threads(self):
+        # type: () -> List[Dict[str, Any]]
+        return self._meta["threads"]
+
+    def get_stack(self, num):
+        # type: (int) -> Optional[Dict[str, Any]]
+        for entry in self.threads:
+            if entry["num"] == num:
+                data = self._archive.read(entry["member"])
+                return json.loads(data.decode("utf-8"))
+
+        return None
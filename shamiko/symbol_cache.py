@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import struct
+import time
+from typing import Any, Dict, List, Optional
+
+import shamiko.cache
+import shamiko.discovery
+import shamiko.namespaces
+
+_ELF_MAGIC = b"\x7fELF"
+_SHT_NOTE = 7
+_NT_GNU_BUILD_ID = 3
+
+_AUTO_LOAD_DIRS = [
+    "/usr/share/gdb/auto-load",
+    "/usr/lib/debug",
+]
+
+
+def _parse_notes(data, endian):
+    # type: (bytes, str) -> Optional[str]
+    offset = 0
+    while offset + 12 <= len(data):
+        namesz, descsz, ntype = struct.unpack_from(endian + "III", data, offset)
+        offset += 12
+        name = data[offset : offset + namesz]
+        offset += (namesz + 3) & ~3
+        desc = data[offset : offset + descsz]
+        offset += (descsz + 3) & ~3
+
+        if ntype == _NT_GNU_BUILD_ID and name.rstrip(b"\0") == b"GNU":
+            return "".join("{:02x}".format(b) for b in bytearray(desc))
+
+    return None
+
+
+def read_build_id(path):
+    # type: (str) -> Optional[str]
+    try:
+        with open(path, "rb") as f:
+            ident = f.read(16)
+            if len(ident) < 16 or ident[:4] != _ELF_MAGIC:
+                return None
+
+            is_64bit = ident[4] == 2
+            endian = "<" if ident[5] == 1 else ">"
+            if is_64bit:
+                f.seek(0x28)
+                (shoff,) = struct.unpack(endian + "Q", f.read(8))
+                f.seek(0x3A)
+                section_format = endian + "IIQQQQ"
+            else:
+                f.seek(0x20)
+                (shoff,) = struct.unpack(endian + "I", f.read(4))
+                f.seek(0x2E)
+                section_format = endian + "IIIIII"
+            shentsize, shnum, _ = struct.unpack(endian + "HHH", f.read(6))
+
+            for i in range(shnum):
+                f.seek(shoff + i * shentsize)
+                header = f.read(struct.calcsize(section_format))
+                _, sh_type, _, _, sh_offset, sh_size = struct.unpack(
+                    section_format, header
+                )
+                if sh_type != _SHT_NOTE:
+                    continue
+
+                f.seek(sh_offset)
+                build_id = _parse_notes(f.read(sh_size), endian)
+                if build_id is not None:
+                    return build_id
+    except (IOError, OSError, struct.error):
+        return None
+
+    return None
+
+
+def get_cache_key(executable):
+    # type: (str) -> str
+    build_id = read_build_id(executable)
+    if build_id is not None:
+        return build_id
+
+    # NOTE: fallback for executables built without build-id
+    stat = os.stat(executable)
+    source = "{}:{}:{}".format(
+        os.path.realpath(executable), stat.st_size, stat.st_mtime_ns
+    )
+    return "path-" + hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def find_helper_scripts(objfiles):
+    # type: (List[str]) -> List[str]
+    # NOTE: python-gdb.py is installed as `[objfile]-gdb.py` either next to
+    # the objfile or under the auto-load directories of gdb
+    helpers = []  # type: List[str]
+    for objfile in objfiles:
+        candidates = []
+        for path in (objfile, os.path.realpath(objfile)):
+            candidates.append(path + "-gdb.py")
+            for auto_load_dir in _AUTO_LOAD_DIRS:
+                candidates.append(auto_load_dir + path + "-gdb.py")
+
+        for candidate in candidates:
+            if os.path.isfile(candidate) and candidate not in helpers:
+                helpers.append(candidate)
+
+    return helpers
+
+
+def get_index_cache_dir():
+    # type: () -> str
+    return shamiko.cache.get_cache_dir("gdb-index")
+
+
+def _get_entry_path(key):
+    # type: (str) -> str
+    return os.path.join(
+        shamiko.cache.get_cache_dir("executables"), "{}.json".format(key)
+    )
+
+
+def load_entry(executable):
+    # type: (str) -> Optional[Dict[str, Any]]
+    path = _get_entry_path(get_cache_key(executable))
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    # NOTE: the helper might be uninstalled after the entry was created
+    if not all(os.path.isfile(h) for h in entry["helpers"]):
+        return None
+
+    return entry
+
+
+def update_entry(executable, pid=None, warmed=False):
+    # type: (str, Optional[int], bool) -> Dict[str, Any]
+    objfiles = [executable]
+    libpython = None
+    if pid is not None:
+        libpython = shamiko.discovery.find_libpython(pid)
+    if libpython is not None:
+        assert pid is not None
+        libpython = shamiko.namespaces.resolve_path(pid, libpython)
+        objfiles.append(libpython)
+
+    key = get_cache_key(executable)
+    entry = {
+        "key": key,
+        "executable": os.path.realpath(executable),
+        "build_id": read_build_id(executable),
+        "libpython": libpython,
+        "helpers": find_helper_scripts(objfiles),
+        "updated_at": time.time(),
+        "warmed": warmed,
+    }
+    shamiko.cache.write_atomic(_get_entry_path(key), json.dumps(entry))
+    return entry
+
+
+def list_entries():
+    # type: () -> List[Dict[str, Any]]
+    directory = shamiko.cache.get_cache_dir("executables")
+    entries = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                entries.append(json.load(f))
+        except (IOError, OSError, ValueError):
+            continue
+
+    return entries
+
+
+def get_index_cache_commands():
+    # type: () -> List[str]
+    # NOTE: gdb writes the symbol index of each objfile keyed by its
+    # build-id, and reuses it on subsequent runs
+    # NOTE: `set index-cache on` became `set index-cache enabled on` in
+    # gdb 12, and the old form is deprecated there
+    return [
+        "set index-cache directory {}".format(get_index_cache_dir()),
+        "py gdb.execute('set index-cache ' + ("
+        "'enabled on' if int(gdb.VERSION.split('.')[0]) >= 12 else 'on'))",
+    ]
+
+
+def get_helper_commands(executable, pid=None):
+    # type: (str, Optional[int]) -> List[str]
+    try:
+        entry = load_entry(executable)
+        if entry is None:
+            entry = update_entry(executable, pid)
+    except (IOError, OSError):
+        # NOTE: the executable may have been removed or replaced since the
+        # process started. gdb still works without helpers.
+        return []
+
+    return [
+        "add-auto-load-safe-path {}".format(helper)
+        for helper in entry["helpers"]
+    ]
+
+
+def get_gdb_options(executable, pid=None):
+    # type: (str, Optional[int]) -> List[str]
+    options = []  # type: List[str]
+    for command in get_index_cache_commands() + get_helper_commands(
+        executable, pid
+    ):
+        options.extend(["-iex", command])
+
+    return options
+
+
+def get_helper_loader(executable):
+    # type: (str) -> Optional[str]
+    # NOTE: a python command which loads the helper explicitly when gdb
+    # couldn't auto-load it, e.g. the objfile was found through a symlink
+    try:
+        entry = load_entry(executable)
+    except (IOError, OSError):
+        return None
+
+    if entry is None or len(entry["helpers"]) == 0:
+        return None
+
+    return (
+        "py if not hasattr(sys.modules['__main__'], 'Frame'): "
+        "gdb.execute('source {}')".format(entry["helpers"][0])
+    )
+
+
+def warm(executable, pid=None):
+    # type: (str, Optional[int]) -> Dict[str, Any]
+    import subprocess
+
+    update_entry(executable, pid)
+    command = ["gdb", "-q", "-batch"] + get_gdb_options(executable, pid)
+    command.append(executable)
+    if pid is not None:
+        # NOTE: attaching is required to load shared libraries like libpython
+        command.extend(["-p", str(pid)])
+
+    subprocess.run(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return update_entry(executable, pid, warmed=True)
+
+
+def clear():
+    # type: () -> None
+    import shutil
+
+    for name in ("executables", "gdb-index"):
+        shutil.rmtree(shamiko.cache.get_cache_dir(name))
@@ -0,0 +1,91 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+class ThreadUsage:
+    def __init__(self, lwp, name, user, system):
+        # type: (int, str, float, float) -> None
+        self.lwp = lwp
+        self.name = name
+        # NOTE: percentages of a single CPU during the interval
+        self.user = user
+        self.system = system
+
+    @property
+    def cpu(self):
+        # type: () -> float
+        return self.user + self.system
+
+
+def _read_stat(path):
+    # type: (str) -> Optional[Tuple[str, int, int]]
+    try:
+        with open(path, "rb") as f:
+            data = f.read().decode("utf-8", "replace")
+    except (IOError, OSError):
+        return None
+
+    # NOTE: the name may contain spaces and parentheses
+    start = data.find("(")
+    end = data.rfind(")")
+    if start < 0 or end < 0:
+        return None
+
+    # NOTE: fields after the name start from the 3rd field (state), so that
+    # utime (14th) and stime (15th) are at 11 and 12
+    fields = data[end + 2 :].split()
+    if len(fields) < 13:
+        return None
+
+    return data[start + 1 : end], int(fields[11]), int(fields[12])
+
+
+def read_thread_times(pid):
+    # type: (int) -> Dict[int, Tuple[str, int, int]]
+    # NOTE: returns {lwp: (name, utime, stime)} in clock ticks
+    task_dir = "/proc/{}/task".format(pid)
+    result = {}  # type: Dict[int, Tuple[str, int, int]]
+    try:
+        names = os.listdir(task_dir)
+    except (IOError, OSError):
+        return result
+
+    for name in names:
+        stat = _read_stat(os.path.join(task_dir, name, "stat"))
+        if stat is not None:
+            result[int(name)] = stat
+
+    return result
+
+
+def sample(pid, interval):
+    # type: (int, float) -> List[ThreadUsage]
+    # NOTE: threads which exited or started during the interval are ignored
+    before = read_thread_times(pid)
+    started_at = time.time()
+    time.sleep(interval)
+    after = read_thread_times(pid)
+    elapsed = time.time() - started_at
+    if elapsed <= 0:
+        return []
+
+    scale = 100.0 / _CLOCK_TICKS / elapsed
+    result = []
+    for lwp, (name, utime, stime) in after.items():
+        if lwp not in before:
+            continue
+        _, prev_utime, prev_stime = before[lwp]
+        result.append(
+            ThreadUsage(
+                lwp,
+                name,
+                (utime - prev_utime) * scale,
+                (stime - prev_stime) * scale,
+            )
+        )
+
+    result.sort(key=lambda u: (-u.cpu, u.lwp))
+    return result
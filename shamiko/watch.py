@@ -0,0 +1,101 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+FrameKey = Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]
+
+
+def _frame_key(frame):
+    # type: (Dict[str, Any]) -> FrameKey
+    return (
+        frame["filename"],
+        frame["line"],
+        frame["function"],
+        frame["description"],
+    )
+
+
+class ThreadState:
+    def __init__(self, stack):
+        # type: (Dict[str, Any]) -> None
+        self.num = stack["num"]  # type: int
+        self.name = stack["name"]  # type: Optional[str]
+        self.lwp = stack["ptid"][1]  # type: int
+        self.frames = stack["frames"]  # type: List[Dict[str, Any]]
+        self.signature = tuple(
+            _frame_key(f) for f in self.frames
+        )  # type: Tuple[FrameKey, ...]
+        self.unchanged_ticks = 0
+
+    def get_signature(self, max_depth):
+        # type: (Optional[int]) -> Tuple[FrameKey, ...]
+        if max_depth is None:
+            return self.signature
+
+        return tuple(
+            _frame_key(f) for f in self.frames if f["index"] <= max_depth
+        )
+
+
+class WatchEvent:
+    NEW = "new"
+    EXITED = "exited"
+    MOVED = "moved"
+    STUCK = "stuck"
+
+    def __init__(self, kind, state):
+        # type: (str, ThreadState) -> None
+        self.kind = kind
+        self.state = state
+
+
+class StackWatcher:
+    def __init__(self, stuck_ticks):
+        # type: (int) -> None
+        self._stuck_ticks = stuck_ticks
+        # NOTE: gdb may renumber threads after re-attaching to the process,
+        # so that threads are identified by LWP
+        self._threads = {}  # type: Dict[int, ThreadState]
+        self._max_depth = None  # type: Optional[int]
+
+    @property
+    def threads(self):
+        # type: () -> List[ThreadState]
+        return sorted(self._threads.values(), key=lambda s: s.lwp)
+
+    def update(self, stacks, max_depth=None):
+        # type: (List[Dict[str, Any]], Optional[int]) -> List[WatchEvent]
+        # NOTE: `max_depth` is the depth limit which the stacks were captured
+        # with. When it changes, stacks are compared only down to the
+        # shallower limit, so that the change alone doesn't move threads.
+        depth = None  # type: Optional[int]
+        if max_depth != self._max_depth:
+            depth = min(
+                d for d in (max_depth, self._max_depth) if d is not None
+            )
+        self._max_depth = max_depth
+
+        events = []  # type: List[WatchEvent]
+        current = {}  # type: Dict[int, ThreadState]
+
+        for stack in stacks:
+            state = ThreadState(stack)
+            previous = self._threads.get(state.lwp, None)
+            current[state.lwp] = state
+
+            if previous is None:
+                events.append(WatchEvent(WatchEvent.NEW, state))
+            elif previous.get_signature(depth) != state.get_signature(depth):
+                events.append(WatchEvent(WatchEvent.MOVED, state))
+            else:
+                state.unchanged_ticks = previous.unchanged_ticks + 1
+                if (
+                    len(state.frames) > 0
+                    and state.unchanged_ticks == self._stuck_ticks
+                ):
+                    events.append(WatchEvent(WatchEvent.STUCK, state))
+
+        for lwp, previous in self._threads.items():
+            if lwp not in current:
+                events.append(WatchEvent(WatchEvent.EXITED, previous))
+
+        self._threads = current
+        return events
@@ -0,0 +1,150 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from shamiko.simple_rpc import serializer
+from shamiko.simple_rpc.serializer import SerializeSession
+from shamiko.simple_rpc.server import RPCServer
+
+
+class _Unserializable(object):
+    pass
+
+
+def _create_sessions():
+    # type: () -> Tuple[SerializeSession, SerializeSession]
+    server_session = SerializeSession()
+    server_session.intern_strings = True
+    client_session = SerializeSession()
+    return server_session, client_session
+
+
+def _transfer(
+    server_session,  # type: SerializeSession
+    client_session,  # type: SerializeSession
+    value,  # type: Any
+):
+    # type: (...) -> Tuple[Dict[str, Any], Any]
+    # NOTE: encoded as JSON, as it is sent over the socket
+    entry = json.loads(json.dumps(serializer.serialize(server_session, value)))
+    return entry, serializer.deserialize(client_session, entry)
+
+
+def _get_definitions(entry):
+    # type: (Any) -> List[str]
+    if isinstance(entry, list):
+        return [s for e in entry for s in _get_definitions(e)]
+    if not isinstance(entry, dict):
+        return []
+
+    definitions = [entry["s"]] if "s" in entry else []
+    return definitions + _get_definitions(entry["v"])
+
+
+def test_round_trip():
+    # type: () -> None
+    server_session, client_session = _create_sessions()
+    value = {
+        "frames": [
+            {"filename": "/app/main.py", "function": "handle"},
+            {"filename": "/app/main.py", "function": "handle"},
+        ],
+        "name": "MainThread",
+    }
+
+    entry, result = _transfer(server_session, client_session, value)
+    assert result == value
+    # NOTE: keys and values are defined by their first occurrences
+    assert _get_definitions(entry) == [
+        "frames",
+        "filename",
+        "/app/main.py",
+        "function",
+        "handle",
+        "name",
+        "MainThread",
+    ]
+
+
+def test_reference_in_later_response():
+    # type: () -> None
+    server_session, client_session = _create_sessions()
+    _, result = _transfer(server_session, client_session, ["filename"])
+    assert result == ["filename"]
+
+    entry, result = _transfer(server_session, client_session, ["filename"])
+    assert result == ["filename"]
+    assert entry["v"][0]["t"] == "istr"
+    assert "s" not in entry["v"][0]
+
+
+def test_reset_on_failure():
+    # type: () -> None
+    server = RPCServer("/nonexistent/test.sock")
+    server._session.intern_strings = True
+    client_session = SerializeSession()
+
+    response = json.loads(server._create_response(["first", "second"]))
+    assert serializer.deserialize(client_session, response["r"]) == [
+        "first",
+        "second",
+    ]
+
+    # NOTE: "third" is defined in the failed response, which never reaches
+    # the client
+    with pytest.raises(AttributeError):
+        server._create_response(["third", _Unserializable()])
+
+    response = json.loads(server._create_response(["third", "first"]))
+    assert _get_definitions(response["r"]) == ["third", "first"]
+    assert serializer.deserialize(client_session, response["r"]) == [
+        "third",
+        "first",
+    ]
+
+
+@pytest.mark.parametrize(
+    "length,interned",
+    [
+        (serializer._INTERN_MIN_LENGTH - 1, False),
+        (serializer._INTERN_MIN_LENGTH, True),
+        (serializer._INTERN_MAX_LENGTH, True),
+        (serializer._INTERN_MAX_LENGTH + 1, False),
+    ],
+)
+def test_length_limits(length, interned):
+    # type: (int, bool) -> None
+    server_session, client_session = _create_sessions()
+    value = "x" * length
+
+    entry, result = _transfer(server_session, client_session, value)
+    assert result == value
+    assert entry["t"] == ("istr" if interned else "str")
+
+
+def test_entry_cap(monkeypatch):
+    # type: (pytest.MonkeyPatch) -> None
+    monkeypatch.setattr(serializer, "_INTERN_MAX_ENTRIES", 2)
+    server_session, client_session = _create_sessions()
+    value = ["alpha", "bravo", "charlie", "alpha", "charlie"]
+
+    entry, result = _transfer(server_session, client_session, value)
+    assert result == value
+    assert [e["t"] for e in entry["v"]] == [
+        "istr",
+        "istr",
+        "str",
+        "istr",
+        "str",
+    ]
+
+
+def test_disabled():
+    # type: () -> None
+    server_session, client_session = _create_sessions()
+    server_session.intern_strings = False
+
+    entry, result = _transfer(server_session, client_session, "filename")
+    assert result == "filename"
+    assert entry["t"] == "str"